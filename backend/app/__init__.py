@@ -19,7 +19,6 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from sqlalchemy import text
-import redis
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -38,6 +37,10 @@ def create_app(config_name=None):
     """
     app = Flask(__name__)
 
+    # Serialize JSON responses with orjson
+    from .utils.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+
     # Load configuration
     if config_name:
         config_class = f'backend.app.config.{config_name.capitalize()}Config'
@@ -55,6 +58,20 @@ def create_app(config_name=None):
     db.init_app(app)
     jwt.init_app(app)
 
+    from .utils.access_tracker import access_tracker
+    access_tracker.init_app(app)
+
+    from .utils.audit import audit_writer
+    audit_writer.init_app(app)
+
+    # Checksums hash every upload; flag builds without the OpenSSL SHA-256
+    from .utils.crypto import checksum_backend
+    sha256_backend = checksum_backend()
+    if sha256_backend:
+        app.logger.info(f"SHA-256 checksums using {sha256_backend}")
+    else:
+        app.logger.warning("hashlib is not OpenSSL-backed; SHA-256 checksums will be slow")
+
     # Middleware for concurrent user optimization
     @app.before_request
     def before_request():
@@ -96,14 +113,8 @@ def create_app(config_name=None):
         }
     })
 
-    # Configure rate limiting
-    if app.config.get('REDIS_URL'):
-        limiter.init_app(app)
-        # Set up Redis connection for rate limiting
-        redis_client = redis.from_url(app.config['REDIS_URL'])
-        limiter.storage = redis_client
-    else:
-        limiter.init_app(app)
+    # Configure rate limiting (storage comes from RATELIMIT_STORAGE_URI)
+    limiter.init_app(app)
 
     # Register blueprints
     from .routes.auth import auth_bp
@@ -24,6 +24,7 @@ class DevelopmentConfig:
         'max_overflow': 30,       # Maximum number of connections that can be created beyond pool_size
         'pool_pre_ping': True,    # Verify connections before use
         'pool_recycle': 3600,     # Recycle connections after 1 hour
+        'query_cache_size': 1200, # Compiled SQL cache entries per engine
         'connect_args': {
             'check_same_thread': False,  # Allow SQLite to be used in multiple threads
             'timeout': 30.0             # Connection timeout
@@ -47,6 +48,23 @@ class DevelopmentConfig:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_FILE_SIZE', 104857600))  # 100MB
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'gif', 'zip', 'rar'}
 
+    # Download offload: let nginx serve files via X-Accel-Redirect
+    USE_X_ACCEL = os.getenv('USE_X_ACCEL', 'false').lower() == 'true'
+    X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/_protected/')
+
+    # Seconds between batched writes of file last-accessed times
+    FILE_ACCESS_FLUSH_INTERVAL = 30
+
+    # Direct-to-bucket message attachment uploads (disabled unless a bucket is set)
+    S3_ATTACHMENT_BUCKET = os.getenv('S3_ATTACHMENT_BUCKET')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # e.g. MinIO; empty for AWS
+    S3_REGION = os.getenv('S3_REGION')
+    S3_PRESIGN_EXPIRES = int(os.getenv('S3_PRESIGN_EXPIRES', 300))
+
+    # Audit log entries are written by a background thread in batches
+    AUDIT_LOG_ASYNC = True
+    AUDIT_FLUSH_INTERVAL = 1  # seconds
+
     # Security configuration
     BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
     ENCRYPTION_KEY_ITERATIONS = int(os.getenv('ENCRYPTION_KEY_ITERATIONS', 100000))
@@ -74,10 +92,11 @@ class DevelopmentConfig:
 
     # Rate limiting optimized for concurrent users
     RATELIMIT_DEFAULT = "200 per minute"  # Increased for 50+ users
-    RATELIMIT_STORAGE_URL = REDIS_URL if REDIS_URL else None  # Fallback to in-memory
+    # Shared counters across workers when Redis is configured
+    RATELIMIT_STORAGE_URI = REDIS_URL or 'memory://'  # Fallback to in-memory
 
     # Specific rate limits for different endpoints
-    RATELIMIT_STRATEGY = "fixed-window"
+    RATELIMIT_STRATEGY = "moving-window"  # No burst at window edges; one atomic script per hit on Redis
     RATELIMIT_HEADERS_ENABLED = True
 
     # Session configuration
@@ -21,6 +21,9 @@ class ProductionConfig:
         raise ValueError("DATABASE_URL environment variable is required in production")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'query_cache_size': 1200,  # Compiled SQL cache entries per engine
+    }
 
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
@@ -34,6 +37,23 @@ class ProductionConfig:
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_FILE_SIZE', 104857600))  # 100MB
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'gif', 'zip', 'rar'}
 
+    # Download offload: let nginx serve files via X-Accel-Redirect
+    USE_X_ACCEL = os.environ.get('USE_X_ACCEL', 'false').lower() == 'true'
+    X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/_protected/')
+
+    # Seconds between batched writes of file last-accessed times
+    FILE_ACCESS_FLUSH_INTERVAL = 30
+
+    # Direct-to-bucket message attachment uploads (disabled unless a bucket is set)
+    S3_ATTACHMENT_BUCKET = os.environ.get('S3_ATTACHMENT_BUCKET')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # e.g. MinIO; empty for AWS
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_PRESIGN_EXPIRES = int(os.environ.get('S3_PRESIGN_EXPIRES', 300))
+
+    # Audit log entries are written by a background thread in batches
+    AUDIT_LOG_ASYNC = True
+    AUDIT_FLUSH_INTERVAL = 1  # seconds
+
     # Security configuration
     BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
     ENCRYPTION_KEY_ITERATIONS = int(os.environ.get('ENCRYPTION_KEY_ITERATIONS', 100000))
@@ -65,7 +85,9 @@ class ProductionConfig:
 
     # Rate limiting
     RATELIMIT_DEFAULT = "100 per minute"
-    RATELIMIT_STORAGE_URL = REDIS_URL
+    RATELIMIT_STORAGE_URI = REDIS_URL  # Counters shared by all workers and nodes
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True  # Keep limiting per worker if Redis is down
+    RATELIMIT_STRATEGY = "moving-window"  # No burst at window edges; one atomic script per hit on Redis
 
     # Session configuration
     SESSION_TYPE = 'redis'
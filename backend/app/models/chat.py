@@ -3,6 +3,7 @@ Chat models for Cryptee secure messaging.
 """
 
 from datetime import datetime
+from sqlalchemy import func
 from .. import db
 
 
@@ -10,11 +11,17 @@ class ChatConversation(db.Model):
     """Chat conversation model for secure messaging between users."""
 
     __tablename__ = 'chat_conversations'
+    __table_args__ = (
+        # One conversation per unordered pair of users
+        db.Index('ix_chat_conversations_participant_pair', 'participant_low_id', 'participant_high_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.String(64), unique=True, nullable=False, index=True)  # Unique conversation identifier
     participant1_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     participant2_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    participant_low_id = db.Column(db.Integer, nullable=False)  # min(participant1_id, participant2_id)
+    participant_high_id = db.Column(db.Integer, nullable=False)  # max(participant1_id, participant2_id)
     participant1_username = db.Column(db.String(50), nullable=False)  # Cached for performance
     participant2_username = db.Column(db.String(50), nullable=False)  # Cached for performance
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -36,11 +43,17 @@ class ChatConversation(db.Model):
         self.participant2_id = participant2_id
         self.participant1_username = participant1_username
         self.participant2_username = participant2_username
+        self.participant_low_id, self.participant_high_id = self.participant_pair(participant1_id, participant2_id)
         # Generate unique conversation ID
         import hashlib
         participants = sorted([str(participant1_id), str(participant2_id)])
         self.conversation_id = hashlib.sha256(f"{participants[0]}_{participants[1]}".encode()).hexdigest()[:16]
 
+    @staticmethod
+    def participant_pair(user_a_id, user_b_id):
+        """Return the canonical (low, high) ordering of two participant IDs."""
+        return min(user_a_id, user_b_id), max(user_a_id, user_b_id)
+
     def update_last_message(self, message_content, message_time=None):
         """Update the last message information."""
         self.last_message_preview = message_content[:200] if message_content else ""
@@ -64,7 +77,8 @@ class ChatConversation(db.Model):
             'last_message_preview': self.last_message_preview,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'message_count': self.messages.count()
+            'message_count': db.session.query(func.count(ChatMessage.id))
+                .filter(ChatMessage.conversation_id == self.id).scalar()
         }
 
         # Add participant info
@@ -5,12 +5,19 @@ File model for Cryptee application.
 import os
 import secrets
 from datetime import datetime
+from sqlalchemy import DDL, event, func
 from .. import db
 
 class File(db.Model):
     """File model for storing encrypted file metadata."""
 
     __tablename__ = 'files'
+    __table_args__ = (
+        # Live-file listings: filter by owner + is_deleted, sorted by list_files columns
+        db.Index('ix_files_user_live_date', 'user_id', 'is_deleted', 'upload_date'),
+        db.Index('ix_files_user_live_name', 'user_id', 'is_deleted', 'original_filename'),
+        db.Index('ix_files_user_live_size', 'user_id', 'is_deleted', 'file_size'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -89,7 +96,9 @@ class File(db.Model):
 
     def get_share_count(self):
         """Get the number of active shares for this file."""
-        return self.shares.filter_by(is_active=True).count()
+        from .share import Share
+        return db.session.query(func.count(Share.id)) \
+            .filter(Share.file_id == self.id, Share.is_active.is_(True)).scalar()
 
     def to_dict(self, include_path=False):
         """Convert file to dictionary representation."""
@@ -115,4 +124,16 @@ class File(db.Model):
         return data
 
     def __repr__(self):
-        return f'<File {self.original_filename} ({self.size_mb}MB)>'
\ No newline at end of file
+        return f'<File {self.original_filename} ({self.size_mb}MB)>'
+
+
+# Trigram index so list_files' ILIKE '%search%' can use an index on PostgreSQL
+event.listen(
+    File.__table__,
+    'after_create',
+    DDL(
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+        "CREATE INDEX IF NOT EXISTS ix_files_original_filename_trgm ON files "
+        "USING gin (original_filename gin_trgm_ops) WHERE is_deleted = false"
+    ).execute_if(dialect='postgresql')
+)
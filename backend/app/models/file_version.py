@@ -36,7 +36,8 @@ class FileVersion(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
     # Relationships
-    file = db.relationship('File', backref=db.backref('versions', lazy='dynamic', order_by='FileVersion.version_number.desc()'))
+    file = db.relationship('File', backref=db.backref('versions', lazy='dynamic', order_by='FileVersion.version_number.desc()',
+                                                      cascade='all, delete-orphan'))
     creator = db.relationship('User', backref=db.backref('file_versions', lazy='dynamic'))
 
     def __init__(self, file_id, version_number, filename, original_filename, file_size,
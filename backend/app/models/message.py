@@ -3,6 +3,7 @@ Message model for Cryptee secure messaging.
 """
 
 from datetime import datetime
+from sqlalchemy import DDL, event
 from .. import db
 
 
@@ -10,6 +11,13 @@ class Message(db.Model):
     """Message model for secure messaging between users."""
 
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Inbox/outbox listings: filter by owner + is_deleted, newest first by (created_at, id)
+        db.Index('ix_msg_recipient_list', 'recipient_id', 'is_deleted', 'created_at', 'id'),
+        db.Index('ix_msg_sender_list', 'sender_id', 'is_deleted', 'created_at', 'id'),
+        # Unread filter on the inbox
+        db.Index('ix_msg_recipient_unread', 'recipient_id', 'is_read', 'is_deleted'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -37,8 +45,12 @@ class Message(db.Model):
         self.content = content
         self.message_type = message_type
 
-    def to_dict(self, include_sender=True, include_recipient=True):
-        """Convert message to dictionary representation."""
+    def to_dict(self, include_sender=True, include_recipient=True, attachment_count=None):
+        """Convert message to dictionary representation.
+
+        When attachment_count is given it is reported instead of the
+        attachment list, so listings never load the attachments.
+        """
         data = {
             'id': self.id,
             'subject': self.subject,
@@ -46,11 +58,15 @@ class Message(db.Model):
             'message_type': self.message_type,
             'is_read': self.is_read,
             'is_deleted': self.is_deleted,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'attachments': [attachment.to_dict() for attachment in self.attachments]
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
+        if attachment_count is None:
+            data['attachments'] = [attachment.to_dict() for attachment in self.attachments]
+        else:
+            data['attachment_count'] = attachment_count
+
         if include_sender and self.sender:
             data['sender'] = {
                 'id': self.sender.id,
@@ -116,7 +132,7 @@ class MessageAttachment(db.Model):
             'storage_path': self.storage_path,
             'checksum': self.checksum,
             'attachment_type': self.attachment_type,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 
@@ -124,6 +140,10 @@ class Contact(db.Model):
     """Contact model for sharing contact information."""
 
     __tablename__ = 'contacts'
+    __table_args__ = (
+        # get_contacts filters by owner and orders by name
+        db.Index('ix_contact_user_name', 'user_id', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -156,6 +176,26 @@ class Contact(db.Model):
             'phone': self.phone,
             'company': self.company,
             'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+# Full-text indexes for get_messages search (the query side is in routes/messages.py)
+MESSAGE_SEARCH_TSV = "to_tsvector('simple', coalesce(messages.subject, '') || ' ' || coalesce(messages.content, ''))"
+
+event.listen(
+    Message.__table__,
+    'after_create',
+    DDL(
+        "ALTER TABLE messages ADD FULLTEXT INDEX ix_msg_fulltext (subject, content)"
+    ).execute_if(dialect='mysql')
+)
+event.listen(
+    Message.__table__,
+    'after_create',
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_msg_search_tsv ON messages USING gin "
+        f"({MESSAGE_SEARCH_TSV})"
+    ).execute_if(dialect='postgresql')
+)
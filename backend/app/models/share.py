@@ -2,14 +2,27 @@
 Share model for Cryptee application.
 """
 
+import math
 import secrets
 from datetime import datetime, timedelta
 from .. import db
 
+# Kilometres per degree for the equirectangular ("cheap ruler") distance
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+
 class Share(db.Model):
     """Share model for managing file sharing links and permissions."""
 
     __tablename__ = 'shares'
+    __table_args__ = (
+        # Received-files lookups filter on recipient + active flag
+        db.Index('ix_shares_recipient_active', 'recipient_id', 'is_active'),
+        # A user's shares newest first (list_shares, share stats, activity feed)
+        db.Index('ix_shares_sharer_created', 'sharer_id', 'created_at'),
+        # Active, unexpired shares of a user (list_shares active_only, share stats)
+        db.Index('ix_shares_sharer_active_exp', 'sharer_id', 'is_active', 'expires_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     share_link = db.Column(db.String(64), unique=True, nullable=False, index=True)
@@ -74,7 +87,7 @@ class Share(db.Model):
         # Set password if provided
         if password:
             from werkzeug.security import generate_password_hash
-            self.password_hash = generate_password_hash(password, method='bcrypt')
+            self.password_hash = generate_password_hash(password, method='scrypt')
 
     def _generate_share_link(self):
         """Generate a unique share link."""
@@ -126,7 +139,7 @@ class Share(db.Model):
 
         # Check country restriction
         if self.allowed_countries and user_country:
-            if user_country.upper() not in [c.upper() for c in self.allowed_countries]:
+            if user_country.upper() not in {c.upper() for c in self.allowed_countries}:
                 return False, f"Access not allowed from {user_country}"
 
         # Check city restriction
@@ -153,25 +166,15 @@ class Share(db.Model):
         return True, "Device allowed"
 
     def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance between two points using Haversine formula."""
-        import math
-
-        # Convert to radians
-        lat1_rad = math.radians(lat1)
-        lng1_rad = math.radians(lng1)
-        lat2_rad = math.radians(lat2)
-        lng2_rad = math.radians(lng2)
-
-        # Haversine formula
-        dlat = lat2_rad - lat1_rad
-        dlng = lng2_rad - lng1_rad
+        """Approximate distance in km between two points (equirectangular projection).
 
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-        # Earth's radius in kilometers
-        R = 6371
-        return R * c
+        Within a fraction of a percent of the haversine distance at geofence
+        scales (up to a few hundred km), with a single cosine per call.
+        """
+        dlng = (lng2 - lng1 + 180) % 360 - 180  # shortest way across the antimeridian
+        dx = dlng * KM_PER_DEG_LNG_EQUATOR * math.cos(math.radians((lat1 + lat2) / 2))
+        dy = (lat2 - lat1) * KM_PER_DEG_LAT
+        return math.sqrt(dx * dx + dy * dy)
 
     def check_password(self, password):
         """Verify share password if set."""
@@ -203,23 +206,30 @@ class Share(db.Model):
 
     def to_dict(self, include_sensitive=False):
         """Convert share to dictionary representation."""
+        # One clock reading for all the time-derived fields (datetimes are
+        # serialized to ISO 8601 by the app's JSON provider)
+        now = datetime.utcnow()
+        is_expired = self.expires_at and self.expires_at < now
+        is_time_locked = self.unlock_time and self.unlock_time > now
+        limit_reached = self.max_downloads != -1 and self.download_count >= self.max_downloads
+
         data = {
             'id': self.id,
             'share_link': self.share_link,
             'is_active': self.is_active,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'expires_at': self.expires_at,
             'max_downloads': self.max_downloads,
             'download_count': self.download_count,
             'downloads_remaining': self.downloads_remaining,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None,
+            'created_at': self.created_at,
+            'last_accessed': self.last_accessed,
             'file_id': self.file_id,
             'sharer_id': self.sharer_id,
             'recipient_id': self.recipient_id,
-            'is_expired': self.is_expired,
-            'can_download': self.can_download,
+            'is_expired': is_expired,
+            'can_download': bool(self.is_active and not is_expired and not limit_reached),
             # Advanced security features
-            'unlock_time': self.unlock_time.isoformat() if self.unlock_time else None,
+            'unlock_time': self.unlock_time,
             'is_one_time': self.is_one_time,
             'device_fingerprint': self.device_fingerprint,
             'allowed_countries': self.allowed_countries,
@@ -227,8 +237,8 @@ class Share(db.Model):
             'center_lat': self.center_lat,
             'center_lng': self.center_lng,
             'max_distance_km': self.max_distance_km,
-            'is_time_locked': self.is_time_locked,
-            'time_until_unlock': self.time_until_unlock
+            'is_time_locked': is_time_locked,
+            'time_until_unlock': int((self.unlock_time - now).total_seconds()) if is_time_locked else 0
         }
 
         if include_sensitive:
@@ -16,8 +16,8 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     username = db.Column(db.String(50), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(128), nullable=False)
-    first_name = db.Column(db.String(50))
-    last_name = db.Column(db.String(50))
+    first_name = db.Column(db.String(50), index=True)  # Index for admin name search
+    last_name = db.Column(db.String(50), index=True)  # Index for admin name search
     profile_picture = db.Column(db.String(255))  # Path to profile picture file
     is_active = db.Column(db.Boolean, default=True, index=True)  # Index for active users
     is_email_verified = db.Column(db.Boolean, default=False, index=True)  # Index for verified users
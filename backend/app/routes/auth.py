@@ -11,7 +11,6 @@ from flask_jwt_extended import (
 )
 from werkzeug.security import check_password_hash
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 import base64
 import json
 import secrets
@@ -47,7 +46,7 @@ def decrypt_payload(encrypted_data, key):
         current_app.logger.info(f'Encrypted bytes length: {len(encrypted_bytes)}')
 
         # Create cipher
-        cipher = Cipher(algorithms.AES(key_bytes), modes.CBC(iv), backend=default_backend())
+        cipher = Cipher(algorithms.AES(key_bytes), modes.CBC(iv))
         decryptor = cipher.decryptor()
 
         # Decrypt
@@ -186,7 +185,7 @@ def register():
 
             # Generate tokens
             try:
-                access_token = create_access_token(identity=user.id)
+                access_token = create_access_token(identity=user.id, additional_claims={'role': user.role})
                 refresh_token = create_refresh_token(identity=user.id)
             except Exception as token_error:
                 current_app.logger.error(f'Token generation failed: {token_error}')
@@ -340,7 +339,7 @@ def login():
 
             # Generate tokens
             try:
-                access_token = create_access_token(identity=user.id)
+                access_token = create_access_token(identity=user.id, additional_claims={'role': user.role})
                 refresh_token = create_refresh_token(identity=user.id)
                 current_app.logger.info(f'Tokens generated successfully for user {user.id}')
             except Exception as token_error:
@@ -422,7 +421,7 @@ def refresh_token():
             return jsonify({'error': 'User not found'}), 404
 
         # Generate new access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims={'role': user.role})
 
         return jsonify({
             'access_token': access_token,
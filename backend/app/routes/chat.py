@@ -2,17 +2,67 @@
 Chat API endpoints for Cryptee secure messaging.
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_, and_, desc
+from sqlalchemy import or_, desc, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import hashlib
+import orjson
 
 from .. import db, limiter
 from ..models import User, ChatConversation, ChatMessage, ChatTheme, ChatSettings
 
 chat_bp = Blueprint('chat', __name__)
 
+MAX_CONTENT_LEN = 8192  # Characters per chat message
+MAX_RECIPIENT_LEN = 254  # Longest valid email address (RFC 5321)
+MAX_QUERY_LEN = 64  # Characters per user search query
+
+
+@chat_bp.before_request
+def _init_auth_context():
+    """Set up the per-request identity cache used by the chat endpoints."""
+    g.user_id = None
+    g.user = None
+
+
+def _current_user_id():
+    """Get the JWT identity for this request, resolved once."""
+    if g.user_id is None:
+        g.user_id = get_jwt_identity()
+    return g.user_id
+
+
+def _current_user():
+    """Get the authenticated User for this request, loaded at most once."""
+    if g.user is None:
+        g.user = db.session.get(User, _current_user_id())
+    return g.user
+
+
+def _load_conversation(conversation_id, user_id):
+    """
+    Fetch a conversation the user participates in, with both participants loaded.
+
+    The ACL check is part of the query, so a missing conversation and one the
+    user cannot access both return None. The result is cached on `g` for the
+    rest of the request.
+    """
+    cache = g.setdefault('chat_conversations', {})
+    key = (conversation_id, user_id)
+    if key not in cache:
+        cache[key] = db.session.query(ChatConversation).options(
+            joinedload(ChatConversation.participant1),
+            joinedload(ChatConversation.participant2)
+        ).filter(
+            ChatConversation.conversation_id == conversation_id,
+            or_(ChatConversation.participant1_id == user_id,
+                ChatConversation.participant2_id == user_id)
+        ).first()
+    return cache[key]
+
 
 @chat_bp.route('/profile', methods=['GET'])
 @jwt_required()
@@ -20,8 +70,7 @@ chat_bp = Blueprint('chat', __name__)
 def get_chat_profile():
     """Get current user's chat profile information."""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = _current_user()
 
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -45,7 +94,7 @@ def get_chat_profile():
 def get_conversations():
     """Get user's chat conversations."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
         # Get all conversations where user is a participant
         conversations = ChatConversation.query.filter(
@@ -57,12 +106,12 @@ def get_conversations():
         for conv in conversations:
             conv_data = conv.to_dict(user_id)
             # Add unread message count
-            unread_count = ChatMessage.query.filter_by(
+            unread_count = db.session.query(func.count(ChatMessage.id)).filter_by(
                 conversation_id=conv.id,
                 sender_id=conv.get_other_participant(user_id).id if conv.get_other_participant(user_id) else None,
                 is_read=False,
                 is_deleted=False
-            ).count()
+            ).scalar()
             conv_data['unread_count'] = unread_count
             result.append(conv_data)
 
@@ -82,19 +131,17 @@ def get_conversations():
 def get_conversation(conversation_id):
     """Get a specific conversation with messages."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
-        # Find conversation
-        conversation = ChatConversation.query.filter_by(conversation_id=conversation_id).first()
+        # Find conversation (only returned if user is a participant)
+        conversation = _load_conversation(conversation_id, user_id)
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
 
-        # Check if user is participant
-        if conversation.participant1_id != user_id and conversation.participant2_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
-
         # Get messages (limit to last 100 for performance)
-        messages = ChatMessage.query.filter_by(
+        messages = ChatMessage.query.options(
+            joinedload(ChatMessage.sender)
+        ).filter_by(
             conversation_id=conversation.id,
             is_deleted=False
         ).order_by(ChatMessage.created_at.desc()).limit(100).all()
@@ -114,12 +161,26 @@ def get_conversation(conversation_id):
         for msg in unread_messages:
             msg.mark_as_read()
 
-        db.session.commit()
+        # Serialize before the commit expires the loaded rows, so neither the
+        # messages nor their senders are reloaded one by one
+        conversation_json = orjson.dumps(conversation.to_dict(user_id))
+        message_chunks = [orjson.dumps(msg.to_dict()) for msg in messages]
 
-        return jsonify({
-            'conversation': conversation.to_dict(user_id),
-            'messages': [msg.to_dict() for msg in messages]
-        })
+        if unread_messages:
+            db.session.commit()
+
+        def generate():
+            # Emit one message at a time instead of joining the whole payload
+            yield b'{"conversation":'
+            yield conversation_json
+            yield b',"messages":['
+            for index, chunk in enumerate(message_chunks):
+                if index:
+                    yield b','
+                yield chunk
+            yield b']}'
+
+        return Response(generate(), mimetype='application/json')
 
     except Exception as e:
         current_app.logger.error(f'Error getting conversation: {e}')
@@ -132,12 +193,15 @@ def get_conversation(conversation_id):
 def create_conversation():
     """Create a new chat conversation."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
         data = request.get_json()
 
         if not data or 'recipient' not in data:
             return jsonify({'error': 'Recipient is required'}), 400
 
+        if not isinstance(data['recipient'], str) or len(data['recipient']) > MAX_RECIPIENT_LEN:
+            return jsonify({'error': 'Invalid recipient'}), 400
+
         recipient_identifier = data['recipient'].strip()
 
         # Find recipient by username, email, or cryptee ID
@@ -148,7 +212,7 @@ def create_conversation():
 
         # Try email if not found
         if not recipient:
-            recipient = User.query.filter_by(email=recipient_identifier).first()
+            recipient = User.query.filter_by(email=recipient_identifier.lower()).first()
 
         # Try cryptee ID
         if not recipient:
@@ -161,13 +225,10 @@ def create_conversation():
             return jsonify({'error': 'Cannot start conversation with yourself'}), 400
 
         # Check if conversation already exists
-        existing_conversation = ChatConversation.query.filter(
-            or_(
-                and_(ChatConversation.participant1_id == user_id,
-                     ChatConversation.participant2_id == recipient.id),
-                and_(ChatConversation.participant1_id == recipient.id,
-                     ChatConversation.participant2_id == user_id)
-            )
+        low_id, high_id = ChatConversation.participant_pair(user_id, recipient.id)
+        existing_conversation = ChatConversation.query.filter_by(
+            participant_low_id=low_id,
+            participant_high_id=high_id
         ).first()
 
         if existing_conversation:
@@ -177,7 +238,7 @@ def create_conversation():
             })
 
         # Get user info
-        user = User.query.get(user_id)
+        user = _current_user()
 
         # Create new conversation
         conversation = ChatConversation(
@@ -188,7 +249,19 @@ def create_conversation():
         )
 
         db.session.add(conversation)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request created the same pair first
+            db.session.rollback()
+            existing_conversation = ChatConversation.query.filter_by(
+                participant_low_id=low_id,
+                participant_high_id=high_id
+            ).first()
+            return jsonify({
+                'conversation': existing_conversation.to_dict(user_id),
+                'message': 'Conversation already exists'
+            })
 
         return jsonify({
             'conversation': conversation.to_dict(user_id),
@@ -207,12 +280,18 @@ def create_conversation():
 def send_message():
     """Send a chat message."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
         data = request.get_json()
 
         if not data or 'conversation_id' not in data or 'content' not in data:
             return jsonify({'error': 'Conversation ID and content are required'}), 400
 
+        if not isinstance(data['content'], str):
+            return jsonify({'error': 'Message content must be a string'}), 400
+
+        if len(data['content']) > MAX_CONTENT_LEN:
+            return jsonify({'error': f'Message too long. Maximum length is {MAX_CONTENT_LEN} characters'}), 413
+
         conversation_id = data['conversation_id']
         content = data['content'].strip()
         message_type = data.get('message_type', 'text')
@@ -221,15 +300,11 @@ def send_message():
         if not content and message_type == 'text':
             return jsonify({'error': 'Message content cannot be empty'}), 400
 
-        # Find conversation
-        conversation = ChatConversation.query.filter_by(conversation_id=conversation_id).first()
+        # Find conversation (only returned if user is a participant)
+        conversation = _load_conversation(conversation_id, user_id)
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
 
-        # Check if user is participant
-        if conversation.participant1_id != user_id and conversation.participant2_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
-
         # Check chat settings and anti-brute force
         settings = ChatSettings.query.filter_by(user_id=user_id).first()
         if not settings:
@@ -281,17 +356,21 @@ def send_message():
 def delete_message(message_id):
     """Delete a chat message (soft delete)."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
-        message = ChatMessage.query.get(message_id)
-        if not message:
-            return jsonify({'error': 'Message not found'}), 404
+        # Soft delete in one statement; only the sender's own messages match
+        deleted = ChatMessage.query.filter_by(
+            id=message_id,
+            sender_id=user_id,
+            is_deleted=False
+        ).update({
+            'is_deleted': True,
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
 
-        # Check if user is sender
-        if message.sender_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
+        if not deleted:
+            return jsonify({'error': 'Message not found'}), 404
 
-        message.mark_as_deleted()
         db.session.commit()
 
         return jsonify({'message': 'Message deleted successfully'})
@@ -308,7 +387,7 @@ def delete_message(message_id):
 def chat_settings():
     """Get or update chat settings."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
         settings = ChatSettings.query.filter_by(user_id=user_id).first()
         if not settings:
@@ -355,7 +434,7 @@ def chat_settings():
 def get_themes():
     """Get user's chat themes."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
         themes = ChatTheme.query.filter_by(user_id=user_id).order_by(ChatTheme.created_at).all()
 
@@ -375,7 +454,7 @@ def get_themes():
 def create_theme():
     """Create a new chat theme."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
         data = request.get_json()
 
         if not data or 'theme_name' not in data:
@@ -414,7 +493,7 @@ def create_theme():
 def manage_theme(theme_id):
     """Update or delete a chat theme."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
         theme = ChatTheme.query.filter_by(id=theme_id, user_id=user_id).first()
         if not theme:
@@ -466,9 +545,14 @@ def manage_theme(theme_id):
 def search_users():
     """Search for users to start conversations with."""
     try:
-        user_id = get_jwt_identity()
-        query = request.args.get('q', '').strip()
+        user_id = _current_user_id()
+        query = request.args.get('q', '')
 
+        # Skip pathological queries before they reach the LIKE scan
+        if len(query) > MAX_QUERY_LEN:
+            return jsonify({'users': [], 'total': 0})
+
+        query = query.strip()
         if not query or len(query) < 2:
             return jsonify({'users': [], 'total': 0})
 
@@ -511,15 +595,12 @@ def search_users():
 def mark_conversation_read(conversation_id):
     """Mark all messages in a conversation as read."""
     try:
-        user_id = get_jwt_identity()
+        user_id = _current_user_id()
 
-        conversation = ChatConversation.query.filter_by(conversation_id=conversation_id).first()
+        conversation = _load_conversation(conversation_id, user_id)
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
 
-        if conversation.participant1_id != user_id and conversation.participant2_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
-
         # Mark all unread messages from other participant as read
         other_participant_id = conversation.get_other_participant(user_id).id
         unread_messages = ChatMessage.query.filter_by(
@@ -4,34 +4,193 @@ Handles file upload, download, listing, and deletion.
 """
 
 import os
-import hashlib
 import secrets
-from flask import Blueprint, request, jsonify, send_file, current_app
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import quote
+from flask import Blueprint, Response, request, jsonify, send_file, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
+from sqlalchemy import select, union_all, literal, func, tuple_
+from sqlalchemy.orm import joinedload
 from .. import db, limiter
 from ..models import User, File, FileVersion, Share
 from ..utils.logger import RequestLogger, log_error
 from ..utils.validators import validate_file_size, sanitize_filename
 from ..utils.audit import log_activity
-from ..utils.crypto import calculate_checksum
+from ..utils.access_tracker import access_tracker
+from ..utils.crypto import save_with_checksum
+from ..utils.pagination import encode_cursor, decode_cursor
 
 files_bp = Blueprint('files', __name__)
 
+# Shared pool for overlapping unlink() calls when removing many stored files
+_delete_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='file-delete')
+
+# Sortable columns for the files listing
+_SORT_COLUMNS = {
+    'filename': File.original_filename,
+    'size': File.file_size,
+    'upload_date': File.upload_date
+}
+
+
+def _upload_settings(app):
+    """
+    Get an app's derived upload settings, cached in app.extensions.
+
+    The cache is rebuilt whenever ALLOWED_EXTENSIONS or UPLOAD_FOLDER is
+    replaced in the config, so later overrides (e.g. in tests) take effect.
+    """
+    allowed = app.config.get('ALLOWED_EXTENSIONS', set())
+    folder = app.config.get('UPLOAD_FOLDER', 'uploads')
+    settings = app.extensions.get('cryptee_upload')
+    if settings is None or settings['allowed_source'] is not allowed or settings['folder'] != folder:
+        os.makedirs(folder, exist_ok=True)
+        settings = {
+            'allowed_source': allowed,
+            'allowed_ext': frozenset(ext.lower() for ext in allowed),
+            'folder': folder
+        }
+        app.extensions['cryptee_upload'] = settings
+    return settings
+
+
+@files_bp.record_once
+def _load_upload_config(state):
+    """Cache upload settings and create the upload folder once at startup."""
+    _upload_settings(state.app)
+
+
+def upload_folder():
+    """Get the current app's upload folder."""
+    return _upload_settings(current_app)['folder']
+
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
-    allowed_extensions = current_app.config.get('ALLOWED_EXTENSIONS', set())
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    return os.path.splitext(filename)[1][1:].lower() in _upload_settings(current_app)['allowed_ext']
+
+
+def send_stored_file(storage_path, download_name, mimetype=None, etag=None):
+    """
+    Send a stored file as an attachment.
+
+    With USE_X_ACCEL enabled the response carries an X-Accel-Redirect header
+    and nginx streams the file itself; otherwise Flask's send_file is used.
+    When an etag (the stored checksum) is given, repeat downloads get a 304.
+    """
+    response = None
+    if current_app.config.get('USE_X_ACCEL'):
+        folder = os.path.abspath(upload_folder())
+        relative_path = os.path.relpath(os.path.abspath(storage_path), folder)
+
+        # Only files inside the upload folder are exposed by the internal location
+        if not relative_path.startswith(os.pardir):
+            prefix = current_app.config.get('X_ACCEL_PREFIX', '/_protected/')
+            response = Response(mimetype=mimetype or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative_path.replace(os.sep, '/'))
+
+            try:
+                download_name.encode('ascii')
+                disposition = {'filename': download_name}
+            except UnicodeEncodeError:
+                simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+                disposition = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='')}"}
+            response.headers.set('Content-Disposition', 'attachment', **disposition)
+
+    if response is None:
+        response = send_file(
+            storage_path,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype=mimetype,
+            conditional=True,
+            etag=False
+        )
+
+    if etag:
+        response.set_etag(etag)
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            # Client copy is current; nginx must not stream the file
+            response.headers.pop('X-Accel-Redirect', None)
+
+    return response
+
+
+def existing_stored_files(paths):
+    """Return the subset of paths present on disk, scanning each directory once."""
+    by_folder = {}
+    for path in paths:
+        by_folder.setdefault(os.path.dirname(path) or '.', set()).add(os.path.basename(path))
 
+    existing = set()
+    for folder, names in by_folder.items():
+        try:
+            with os.scandir(folder) as entries:
+                present = {entry.name for entry in entries if entry.name in names}
+        except FileNotFoundError:
+            continue
+        existing.update(os.path.join(folder, name) if folder != '.' else name for name in present)
+    return existing
+
+
+# Columns read by the files listing, in place of full ORM objects
+_LIST_COLUMNS = (
+    File.id, File.filename, File.original_filename, File.file_size, File.mime_type,
+    File.checksum, File.upload_date, File.last_accessed, File.encryption_iv,
+    File.encryption_salt, File.is_deleted, File.user_id
+)
+
+
+def serialize_file_rows(rows):
+    """
+    Build File.to_dict()-shaped dicts from projected rows.
+
+    Share counts for the whole page come from one grouped query instead of
+    a COUNT per file.
+    """
+    file_ids = [row.id for row in rows]
+    share_counts = {}
+    if file_ids:
+        share_counts = dict(db.session.execute(
+            select(Share.file_id, func.count(Share.id))
+            .where(Share.file_id.in_(file_ids), Share.is_active.is_(True))
+            .group_by(Share.file_id)
+        ).all())
+
+    return [{
+        'id': row.id,
+        'filename': row.filename,
+        'original_filename': row.original_filename,
+        'file_size': row.file_size,
+        'size_mb': round(row.file_size / (1024 * 1024), 2),
+        'mime_type': row.mime_type,
+        'checksum': row.checksum,
+        'upload_date': row.upload_date.isoformat() if row.upload_date else None,
+        'last_accessed': row.last_accessed.isoformat() if row.last_accessed else None,
+        'is_encrypted': row.encryption_iv is not None and row.encryption_salt is not None,
+        'is_deleted': row.is_deleted,
+        'share_count': share_counts.get(row.id, 0),
+        'user_id': row.user_id
+    } for row in rows]
+
+
+def remove_stored_files(paths):
+    """Remove files from storage concurrently, skipping ones already gone."""
+    logger = current_app.logger
+
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to delete file {path}: {e}")
 
-def calculate_checksum(file_path):
-    """Calculate SHA-256 checksum of file."""
-    hash_sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_sha256.update(chunk)
-    return hash_sha256.hexdigest()
+    list(_delete_executor.map(remove, paths))
 
 
 @files_bp.route('', methods=['GET'])
@@ -44,7 +203,8 @@ def list_files():
 
         # Query parameters
         page = int(request.args.get('page', 1))
-        per_page = min(int(request.args.get('per_page', 20)), 100)
+        per_page = max(min(int(request.args.get('per_page', 20)), 100), 1)
+        cursor = request.args.get('cursor')
         search = request.args.get('search', '').strip()
         sort_by = request.args.get('sort_by', 'upload_date')
         sort_order = request.args.get('sort_order', 'desc')
@@ -56,34 +216,56 @@ def list_files():
         if search:
             query = query.filter(File.original_filename.ilike(f'%{search}%'))
 
-        # Apply sorting
-        if sort_by == 'filename':
-            order_column = File.original_filename
-        elif sort_by == 'size':
-            order_column = File.file_size
-        elif sort_by == 'upload_date':
-            order_column = File.upload_date
-        else:
-            order_column = File.upload_date
+        # Keyset pagination on (upload_date, id) for cursor-based clients
+        if cursor is not None:
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                query = query.filter(tuple_(File.upload_date, File.id) < position)
+
+            files = query.with_entities(*_LIST_COLUMNS) \
+                .order_by(File.upload_date.desc(), File.id.desc()).limit(per_page + 1).all()
+            has_next = len(files) > per_page
+            files = files[:per_page]
+
+            return jsonify({
+                'files': serialize_file_rows(files),
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': encode_cursor(files[-1].upload_date, files[-1].id) if has_next else None
+                }
+            }), 200
 
-        if sort_order == 'asc':
-            query = query.order_by(order_column.asc())
+        # Apply sorting
+        order_column = _SORT_COLUMNS.get(sort_by, File.upload_date)
+        query = query.order_by(order_column.asc() if sort_order == 'asc' else order_column.desc())
+
+        # Paginate, fetching the total count in the same scan
+        page = max(page, 1)
+        rows = query.with_entities(*_LIST_COLUMNS, func.count().over().label('total')) \
+            .limit(per_page).offset((page - 1) * per_page).all()
+
+        if rows:
+            total = rows[0].total
+        elif page > 1:
+            # Past the last page the window count is unavailable
+            total = query.order_by(None).with_entities(func.count(File.id)).scalar()
         else:
-            query = query.order_by(order_column.desc())
+            total = 0
 
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        files = pagination.items
+        pages = (total + per_page - 1) // per_page
 
         return jsonify({
-            'files': [file.to_dict() for file in files],
+            'files': serialize_file_rows(rows),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'total': total,
+                'pages': pages,
+                'has_next': page < pages,
+                'has_prev': page > 1
             }
         }), 200
 
@@ -129,16 +311,13 @@ def upload_file():
         random_prefix = secrets.token_hex(8)
         storage_filename = f"{random_prefix}_{secure_name}"
 
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        os.makedirs(upload_folder, exist_ok=True)
-        storage_path = os.path.join(upload_folder, storage_filename)
-
-        # Save file
-        file.save(storage_path)
+        storage_path = os.path.join(upload_folder(), storage_filename)
+        part_path = storage_path + '.part'
+        published = False
 
-        # Calculate file size and checksum
-        file_size = os.path.getsize(storage_path)
-        checksum = calculate_checksum(storage_path)
+        # Save to a partial file, computing size and checksum while streaming
+        file_size, checksum = save_with_checksum(file.stream, part_path,
+                                                 size_hint=request.content_length, sync=True)
 
         # Create file record
         file_record = File(
@@ -156,6 +335,10 @@ def upload_file():
         db.session.add(file_record)
         db.session.commit()
 
+        # Publish the file only once its record is committed
+        os.replace(part_path, storage_path)
+        published = True
+
         response_data = {
             'message': 'File uploaded successfully',
             'file': file_record.to_dict()
@@ -163,7 +346,6 @@ def upload_file():
 
         # Create share if recipient email provided
         if recipient_email:
-            from datetime import timedelta
             expires_at = datetime.utcnow() + timedelta(days=7)  # Default 7 days
 
             # Find recipient user if email matches
@@ -188,9 +370,9 @@ def upload_file():
 
     except Exception as e:
         db.session.rollback()
-        # Clean up uploaded file if it exists
-        if 'storage_path' in locals() and os.path.exists(storage_path):
-            os.remove(storage_path)
+        # Clean up the partial upload; a published file belongs to its committed record
+        if 'part_path' in locals() and not published:
+            remove_stored_files([part_path])
         return jsonify({'error': 'File upload failed', 'details': str(e)}), 500
 
 
@@ -229,17 +411,11 @@ def download_file(file_id):
         if not file.file_exists:
             return jsonify({'error': 'File not found on disk'}), 404
 
-        # Update last accessed timestamp
-        file.mark_accessed()
-        db.session.commit()
+        # Update last accessed timestamp (written in the background)
+        access_tracker.record(file.id)
 
         # Send file with original filename
-        return send_file(
-            file.storage_path,
-            as_attachment=True,
-            download_name=file.original_filename,
-            mimetype=file.mime_type
-        )
+        return send_stored_file(file.storage_path, file.original_filename, file.mime_type, etag=file.checksum)
 
     except Exception as e:
         return jsonify({'error': 'File download failed', 'details': str(e)}), 500
@@ -295,63 +471,6 @@ def restore_file(file_id):
         return jsonify({'error': 'File restoration failed', 'details': str(e)}), 500
 
 
-@files_bp.route('/<int:file_id>/permanent-delete', methods=['DELETE'])
-@jwt_required()
-@limiter.limit("5 per minute")
-def permanent_delete_file_v2(file_id):
-    """Permanently delete a file and remove from storage."""
-    with RequestLogger(current_app.logger, get_jwt_identity()) as logger:
-        try:
-            user_id = get_jwt_identity()
-
-            file = File.query.filter_by(id=file_id, user_id=user_id).first()
-
-            if not file:
-                return jsonify({'error': 'File not found'}), 404
-
-            # Store filename for logging before deletion
-            filename = file.original_filename
-
-            # Remove all version files if they exist
-            for version in file.versions:
-                if version.file_exists:
-                    try:
-                        os.remove(version.storage_path)
-                    except OSError as e:
-                        current_app.logger.warning(f"Failed to delete version file {version.storage_path}: {e}")
-
-            # Remove main file if it exists
-            if file.file_exists:
-                try:
-                    os.remove(file.storage_path)
-                except OSError as e:
-                    current_app.logger.warning(f"Failed to delete main file {file.storage_path}: {e}")
-
-            # Delete database record (cascade will handle versions)
-            db.session.delete(file)
-            db.session.commit()
-
-            # Log permanent deletion
-            log_activity(
-                user_id=user_id,
-                action='permanent_delete',
-                resource_type='file',
-                resource_id=file_id,
-                details={'filename': filename, 'versions_deleted': len(file.versions)},
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent'),
-                request_method=request.method,
-                request_path=request.path
-            )
-
-            return jsonify({'message': 'File and all versions permanently deleted'}), 200
-
-        except Exception as e:
-            db.session.rollback()
-            log_error(current_app.logger, e)
-            return jsonify({'error': 'Permanent deletion failed'}), 500
-
-
 @files_bp.route('/received', methods=['GET'])
 @jwt_required()
 @limiter.limit("50 per minute")
@@ -361,7 +480,10 @@ def get_received_files():
         user_id = get_jwt_identity()
 
         # Get shares where user is recipient
-        shares = Share.query.filter_by(recipient_id=user_id, is_active=True).all()
+        shares = Share.query.options(
+            joinedload(Share.file),
+            joinedload(Share.creator)
+        ).filter_by(recipient_id=user_id, is_active=True).all()
 
         received_files = []
         for share in shares:
@@ -394,37 +516,84 @@ def get_file_history():
     try:
         user_id = get_jwt_identity()
 
-        history = []
-
-        # Sent files
-        user_files = File.query.filter_by(user_id=user_id).all()
-        for file in user_files:
-            for share in file.shares:
-                history.append({
-                    'id': file.id,
-                    'filename': file.original_filename,
-                    'size': file.file_size,
-                    'type': 'sent',
-                    'timestamp': share.created_at.isoformat() if share.created_at else None,
-                    'recipient_email': share.recipient.email if share.recipient else 'public'
-                })
-
-        # Received files
-        shares = Share.query.filter_by(recipient_id=user_id).all()
-        for share in shares:
-            history.append({
-                'id': share.file.id,
-                'filename': share.file.original_filename,
-                'size': share.file.file_size,
-                'type': 'received',
-                'timestamp': share.created_at.isoformat() if share.created_at else None,
-                'sender_email': share.creator.email
-            })
+        # Query parameters
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = max(min(int(request.args.get('per_page', 20)), 100), 1)
+
+        # Sent files: shares of the user's files, with the recipient if any
+        sent = select(
+            File.id.label('id'),
+            File.original_filename.label('filename'),
+            File.file_size.label('size'),
+            literal('sent').label('type'),
+            Share.created_at.label('timestamp'),
+            User.email.label('email')
+        ).select_from(Share).join(
+            File, Share.file_id == File.id
+        ).outerjoin(
+            User, Share.recipient_id == User.id
+        ).where(File.user_id == user_id)
+
+        # Received files: shares addressed to the user, with the sharer
+        received = select(
+            File.id.label('id'),
+            File.original_filename.label('filename'),
+            File.file_size.label('size'),
+            literal('received').label('type'),
+            Share.created_at.label('timestamp'),
+            User.email.label('email')
+        ).select_from(Share).join(
+            File, Share.file_id == File.id
+        ).join(
+            User, Share.sharer_id == User.id
+        ).where(Share.recipient_id == user_id)
+
+        # Sort and paginate in the database (newest first), fetching the
+        # total in the same scan and one extra row to detect a next page
+        combined = union_all(sent, received).subquery()
+        rows = db.session.execute(
+            select(combined, func.count().over().label('total'))
+            .order_by(combined.c.timestamp.desc())
+            .limit(per_page + 1)
+            .offset((page - 1) * per_page)
+        ).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
+        if rows:
+            total = rows[0].total
+        elif page > 1:
+            # Past the last page the window count is unavailable
+            total = db.session.execute(select(func.count()).select_from(combined)).scalar()
+        else:
+            total = 0
 
-        # Sort by timestamp (newest first)
-        history.sort(key=lambda x: x['timestamp'] or '', reverse=True)
+        history = []
+        for row in rows:
+            entry = {
+                'id': row.id,
+                'filename': row.filename,
+                'size': row.size,
+                'type': row.type,
+                'timestamp': row.timestamp.isoformat() if row.timestamp else None
+            }
+            if row.type == 'sent':
+                entry['recipient_email'] = row.email or 'public'
+            else:
+                entry['sender_email'] = row.email
+            history.append(entry)
 
-        return jsonify(history), 200
+        return jsonify({
+            'history': history,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_next': has_next,
+                'has_prev': page > 1
+            }
+        }), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to get file history', 'details': str(e)}), 500
@@ -434,7 +603,7 @@ def get_file_history():
 @jwt_required()
 @limiter.limit("50 per minute")
 def list_file_versions(file_id):
-    """List all versions of a file."""
+    """List versions of a file, latest first, with pagination."""
     with RequestLogger(current_app.logger, get_jwt_identity()) as logger:
         try:
             user_id = get_jwt_identity()
@@ -444,18 +613,42 @@ def list_file_versions(file_id):
             if not file:
                 return jsonify({'error': 'File not found'}), 404
 
-            # Get versions ordered by version number (latest first)
-            versions = file.versions.order_by(FileVersion.version_number.desc()).all()
+            page = max(int(request.args.get('page', 1)), 1)
+            per_page = max(min(int(request.args.get('per_page', 50)), 100), 1)
+
+            # Latest version number and count straight from SQL
+            current_version, total_versions = db.session.execute(
+                select(func.max(FileVersion.version_number), func.count(FileVersion.id))
+                .where(FileVersion.file_id == file.id)
+            ).one()
+
+            # Get a page of versions ordered by version number (latest first)
+            versions = file.versions.options(joinedload(FileVersion.creator)) \
+                .order_by(FileVersion.version_number.desc()) \
+                .limit(per_page).offset((page - 1) * per_page).all()
+
+            # One directory scan instead of a stat() per version
+            on_disk = existing_stored_files([v.storage_path for v in versions])
+            version_dicts = []
+            for version in versions:
+                version_dict = version.to_dict()
+                version_dict['file_exists'] = version.storage_path in on_disk
+                version_dicts.append(version_dict)
 
             # Include file info in response
             response_data = {
                 'file': {
                     'id': file.id,
                     'filename': file.original_filename,
-                    'current_version': max([v.version_number for v in versions]) if versions else 1,
-                    'total_versions': len(versions)
+                    'current_version': current_version or 1,
+                    'total_versions': total_versions
                 },
-                'versions': [version.to_dict() for version in versions]
+                'versions': version_dicts,
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'has_next': page * per_page < total_versions
+                }
             }
 
             return jsonify(response_data), 200
@@ -525,12 +718,8 @@ def download_file_version(file_id, version_id):
             )
 
             # Send file
-            return send_file(
-                version.storage_path,
-                as_attachment=True,
-                download_name=version.original_filename,
-                mimetype=version.mime_type
-            )
+            return send_stored_file(version.storage_path, version.original_filename,
+                                    version.mime_type, etag=version.checksum)
 
         except Exception as e:
             log_error(current_app.logger, e)
@@ -582,15 +771,13 @@ def create_file_version(file_id):
             random_prefix = secrets.token_hex(8)
             storage_filename = f"{random_prefix}_{sanitized_filename}"
 
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-            os.makedirs(upload_folder, exist_ok=True)
-            storage_path = os.path.join(upload_folder, storage_filename)
-
-            # Save new file
-            new_file.save(storage_path)
+            storage_path = os.path.join(upload_folder(), storage_filename)
+            part_path = storage_path + '.part'
+            published = False
 
-            # Calculate checksum
-            checksum = calculate_checksum(storage_path)
+            # Save new file to a partial file, computing checksum while streaming
+            file_size, checksum = save_with_checksum(new_file.stream, part_path,
+                                                     size_hint=file_size, sync=True)
 
             # Get next version number
             latest_version = file.versions.first()
@@ -613,6 +800,10 @@ def create_file_version(file_id):
             db.session.add(version)
             db.session.commit()
 
+            # Publish the file only once its record is committed
+            os.replace(part_path, storage_path)
+            published = True
+
             # Log version creation
             log_activity(
                 user_id=user_id,
@@ -637,9 +828,9 @@ def create_file_version(file_id):
 
         except Exception as e:
             db.session.rollback()
-            # Clean up uploaded file if it exists
-            if 'storage_path' in locals() and os.path.exists(storage_path):
-                os.remove(storage_path)
+            # Clean up the partial upload; a published file belongs to its committed record
+            if 'part_path' in locals() and not published:
+                remove_stored_files([part_path])
             log_error(current_app.logger, e)
             return jsonify({'error': 'Version creation failed'}), 500
 
@@ -668,8 +859,10 @@ def delete_file_version(file_id, version_id):
                 return jsonify({'error': 'Cannot delete original version'}), 400
 
             # Remove physical file if it exists
-            if version.file_exists:
+            try:
                 os.remove(version.storage_path)
+            except FileNotFoundError:
+                pass
 
             # Delete version record
             db.session.delete(version)
@@ -710,35 +903,27 @@ def permanent_delete_file(file_id):
             if not file:
                 return jsonify({'error': 'File not found'}), 404
 
-            # Store filename for logging before deletion
+            # Store filename and version count for logging before deletion
             filename = file.original_filename
+            versions = file.versions.all()
+            versions_deleted = len(versions)
 
-            # Remove all version files if they exist
-            for version in file.versions:
-                if version.file_exists:
-                    try:
-                        os.remove(version.storage_path)
-                    except OSError as e:
-                        current_app.logger.warning(f"Failed to delete version file {version.storage_path}: {e}")
-
-            # Remove main file if it exists
-            if file.file_exists:
-                try:
-                    os.remove(file.storage_path)
-                except OSError as e:
-                    current_app.logger.warning(f"Failed to delete main file {file.storage_path}: {e}")
+            stored_paths = [version.storage_path for version in versions] + [file.storage_path]
 
             # Delete database record (cascade will handle versions)
             db.session.delete(file)
             db.session.commit()
 
+            # Remove main file and all version files from storage
+            remove_stored_files(stored_paths)
+
             # Log permanent deletion
             log_activity(
                 user_id=user_id,
                 action='permanent_delete',
                 resource_type='file',
                 resource_id=file_id,
-                details={'filename': filename, 'versions_deleted': len(file.versions)},
+                details={'filename': filename, 'versions_deleted': versions_deleted},
                 ip_address=request.remote_addr,
                 user_agent=request.headers.get('User-Agent'),
                 request_method=request.method,
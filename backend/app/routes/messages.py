@@ -6,14 +6,24 @@ Handles sending, receiving, and managing secure messages with attachments.
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-import os
+from sqlalchemy import exists, func, inspect, literal_column, select, tuple_, update
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import joinedload, selectinload
 import hashlib
+import math
+import os
+import re
+import secrets
 from datetime import datetime
 from .. import db, limiter
 from ..models import User, Message, MessageAttachment, Contact
+from ..models.message import MESSAGE_SEARCH_TSV
 from ..utils.logger import RequestLogger, log_error
 from ..utils.validators import validate_email, sanitize_text
 from ..utils.audit import log_activity
+from ..utils.crypto import save_with_checksum
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.object_storage import object_storage_enabled, presign_attachment_upload, head_attachment
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -26,27 +36,118 @@ ALLOWED_EXTENSIONS = {
 }
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for form fields and part headers
+SHA256_HEX_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Optional free-text contact fields; empty values are stored as NULL
+CONTACT_TEXT_FIELDS = ('phone', 'company', 'notes')
+
+# Lookup tables derived from ALLOWED_EXTENSIONS
+_ALLOWED_EXTS_BY_TYPE = {t: frozenset(exts) for t, exts in ALLOWED_EXTENSIONS.items()}
+_EXT_TO_TYPE = {ext: t for t, exts in ALLOWED_EXTENSIONS.items() for ext in exts}
 
 
 def allowed_file(filename, file_type):
     """Check if file extension is allowed for the given type."""
-    if file_type not in ALLOWED_EXTENSIONS:
-        return False
     if file_type == 'contact':
         return True  # Contacts don't have file extensions
-    ext = filename.lower().split('.')[-1]
-    return ext in ALLOWED_EXTENSIONS[file_type]
+    return filename.rpartition('.')[2].lower() in _ALLOWED_EXTS_BY_TYPE.get(file_type, ())
 
 
 def get_file_type(filename):
     """Determine file type based on extension."""
-    ext = filename.lower().split('.')[-1]
+    return _EXT_TO_TYPE.get(filename.rpartition('.')[2].lower(), 'document')  # Default to document
+
+
+def message_access_error(message_id):
+    """Response for a gated message write that matched no row: 404 if missing, else 403."""
+    if not db.session.query(exists().where(Message.id == message_id)).scalar():
+        return jsonify({'error': 'Message not found'}), 404
+    return jsonify({'error': 'Access denied'}), 403
+
+
+def mysql_fulltext_available(bind):
+    """
+    Check (once per app) that the ix_msg_fulltext index exists on MySQL.
+
+    MATCH ... AGAINST fails without it; databases created before the index
+    was introduced need migrate_db.py, and the app must be restarted to pick
+    it up.
+    """
+    available = current_app.extensions.get('cryptee_msg_fulltext')
+    if available is None:
+        indexes = inspect(bind).get_indexes('messages')
+        available = any(index['name'] == 'ix_msg_fulltext' for index in indexes)
+        if not available:
+            current_app.logger.warning(
+                "messages has no ix_msg_fulltext index; message search falls back to LIKE "
+                "(run migrate_db.py)"
+            )
+        current_app.extensions['cryptee_msg_fulltext'] = available
+    return available
+
+
+def message_search_filter(search):
+    """Build a subject/content search filter using the database's full-text index."""
+    bind = db.session.get_bind()
+    dialect = bind.dialect.name
+
+    if dialect == 'mysql' and mysql_fulltext_available(bind):
+        return match(Message.subject, Message.content, against=search).in_natural_language_mode()
+
+    if dialect == 'postgresql':
+        # Same expression as the ix_msg_search_tsv index so the planner can use it
+        return literal_column(MESSAGE_SEARCH_TSV).op('@@')(func.plainto_tsquery('simple', search))
+
+    # SQLite (development) or MySQL without the index: substring search
+    return db.or_(
+        Message.subject.ilike(f'%{search}%'),
+        Message.content.ilike(f'%{search}%')
+    )
+
 
-    for file_type, extensions in ALLOWED_EXTENSIONS.items():
-        if file_type != 'contact' and ext in extensions:
-            return file_type
+def content_etag(*parts):
+    """Hash the values a response depends on into an ETag."""
+    return hashlib.blake2b(':'.join(map(str, parts)).encode(), digest_size=16).hexdigest()
 
-    return 'document'  # Default to document
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds this ETag, else None."""
+    if etag in request.if_none_match:
+        return with_etag(current_app.response_class(status=304), etag)
+    return None
+
+
+def with_etag(response, etag):
+    """Tag a per-user response so clients revalidate it instead of refetching."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def serialize_message_page(messages):
+    """Serialize a page of messages with attachment counts from one grouped query."""
+    counts = {}
+    if messages:
+        counts = dict(db.session.execute(
+            select(MessageAttachment.message_id, func.count())
+            .where(MessageAttachment.message_id.in_([message.id for message in messages]))
+            .group_by(MessageAttachment.message_id)
+        ).all())
+
+    return [message.to_dict(
+        include_sender=True,
+        include_recipient=True,
+        attachment_count=counts.get(message.id, 0)
+    ) for message in messages]
+
+
+def message_etag(message):
+    """ETag for a single message; edits, reads and new attachments bump updated_at."""
+    # Whole seconds, so a DATETIME column without fractional seconds round-trips;
+    # legacy rows may have no updated_at at all
+    updated_at = message.updated_at.replace(microsecond=0) if message.updated_at else None
+    return content_etag(message.id, updated_at, message.is_read, message.is_deleted)
 
 
 @messages_bp.route('', methods=['GET'])
@@ -59,57 +160,100 @@ def get_messages():
 
         # Query parameters
         page = int(request.args.get('page', 1))
-        per_page = min(int(request.args.get('per_page', 20)), 100)
+        per_page = max(min(int(request.args.get('per_page', 20)), 100), 1)
+        cursor = request.args.get('cursor')  # keyset pagination; page is ignored when set
         message_type = request.args.get('type')  # sent, received, all
         search = request.args.get('search', '').strip()
         is_read = request.args.get('is_read')  # true, false, or None
 
+        query = Message.query
+
         # Build query based on type
         if message_type == 'sent':
-            query = Message.query.filter_by(sender_id=user_id, is_deleted=False)
+            query = query.filter_by(sender_id=user_id, is_deleted=False)
         elif message_type == 'received':
-            query = Message.query.filter_by(recipient_id=user_id, is_deleted=False)
+            query = query.filter_by(recipient_id=user_id, is_deleted=False)
         else:  # all
-            query = Message.query.filter(
+            query = query.filter(
                 ((Message.sender_id == user_id) | (Message.recipient_id == user_id)) &
                 (Message.is_deleted == False)
             )
 
         # Apply search filter
         if search:
-            query = query.filter(
-                db.or_(
-                    Message.subject.ilike(f'%{search}%'),
-                    Message.content.ilike(f'%{search}%')
-                )
-            )
+            query = query.filter(message_search_filter(search))
 
         # Apply read status filter
         if is_read is not None:
             read_status = is_read.lower() == 'true'
             query = query.filter_by(is_read=read_status)
 
-        # Order by creation date (newest first)
-        query = query.order_by(Message.created_at.desc())
-
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        messages = pagination.items
+        # Load sender and recipient with the page instead of per message
+        page_query = query.options(
+            joinedload(Message.sender),
+            joinedload(Message.recipient)
+        )
 
-        return jsonify({
-            'messages': [message.to_dict(
-                include_sender=True,
-                include_recipient=True
-            ) for message in messages],
+        # Keyset pagination on (created_at, id), skipping the COUNT query
+        if cursor is not None:
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                page_query = page_query.filter(tuple_(Message.created_at, Message.id) < position)
+
+            messages = page_query.order_by(Message.created_at.desc(), Message.id.desc()).limit(per_page + 1).all()
+            has_next = len(messages) > per_page
+            messages = messages[:per_page]
+
+            # Version the page from the rows just read: deletes and new
+            # messages change the ids, reads and attachments the updated_at
+            etag = content_etag(
+                user_id, request.full_path, has_next,
+                ','.join(str(message.id) for message in messages),
+                max((message.updated_at for message in messages if message.updated_at), default=None)
+            )
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            return with_etag(jsonify({
+                'messages': serialize_message_page(messages),
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': encode_cursor(messages[-1].created_at, messages[-1].id) if has_next else None
+                }
+            }), etag), 200
+
+        # Version the listing with the aggregate that also yields the total:
+        # sends, deletes, reads and new attachments all change the count,
+        # max id or max updated_at
+        total, last_id, last_updated = query.with_entities(
+            func.count(Message.id), func.max(Message.id), func.max(Message.updated_at)
+        ).one()
+        etag = content_etag(user_id, request.full_path, total, last_id, last_updated)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        # Page through newest first
+        page = max(page, 1)
+        messages = page_query.order_by(Message.created_at.desc()) \
+            .offset((page - 1) * per_page).limit(per_page).all()
+        pages = math.ceil(total / per_page)
+
+        return with_etag(jsonify({
+            'messages': serialize_message_page(messages),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
+                'total': total,
+                'pages': pages,
+                'has_next': page < pages,
+                'has_prev': page > 1
             }
-        }), 200
+        }), etag), 200
 
     except Exception as e:
         log_error(current_app.logger, e)
@@ -122,12 +266,8 @@ def get_messages():
 def send_message():
     """Send a new message."""
     try:
+        # The JWT identifies the sender; the sender_id foreign key covers the rest
         user_id = get_jwt_identity()
-        sender = User.query.get(user_id)
-
-        if not sender:
-            return jsonify({'error': 'User not found'}), 404
-
         data = request.get_json()
 
         if not data:
@@ -148,19 +288,21 @@ def send_message():
         if not content:
             return jsonify({'error': 'Message content is required'}), 400
 
-        # Find recipient
-        recipient = User.query.filter_by(email=recipient_email).first()
-        if not recipient:
+        # Find recipient (only its id is needed)
+        recipient_id = db.session.execute(
+            select(User.id).where(User.email == recipient_email)
+        ).scalar_one_or_none()
+        if recipient_id is None:
             return jsonify({'error': 'Recipient not found'}), 404
 
         # Don't allow sending to self
-        if recipient.id == user_id:
+        if recipient_id == user_id:
             return jsonify({'error': 'Cannot send message to yourself'}), 400
 
         # Create message
         message = Message(
             sender_id=user_id,
-            recipient_id=recipient.id,
+            recipient_id=recipient_id,
             subject=subject,
             content=content,
             message_type=message_type
@@ -201,7 +343,12 @@ def get_message(message_id):
     try:
         user_id = get_jwt_identity()
 
-        message = Message.query.get(message_id)
+        # Load relations in the same round-trip as the message
+        message = Message.query.options(
+            joinedload(Message.sender),
+            joinedload(Message.recipient),
+            selectinload(Message.attachments)
+        ).filter_by(id=message_id).first()
 
         if not message:
             return jsonify({'error': 'Message not found'}), 404
@@ -210,12 +357,21 @@ def get_message(message_id):
         if message.sender_id != user_id and message.recipient_id != user_id:
             return jsonify({'error': 'Access denied'}), 403
 
-        # Mark as read if recipient is viewing
+        # Mark as read if recipient is viewing; serialize before the commit
+        # expires the instance so the response needs no reload
         if message.recipient_id == user_id and not message.is_read:
             message.mark_as_read()
+            etag = message_etag(message)
+            message_data = message.to_dict()
             db.session.commit()
+            return with_etag(jsonify({'message': message_data}), etag), 200
+
+        etag = message_etag(message)
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
-        return jsonify({'message': message.to_dict()}), 200
+        return with_etag(jsonify({'message': message.to_dict()}), etag), 200
 
     except Exception as e:
         log_error(current_app.logger, e)
@@ -230,23 +386,25 @@ def delete_message(message_id):
     try:
         user_id = get_jwt_identity()
 
-        message = Message.query.get(message_id)
-
-        if not message:
-            return jsonify({'error': 'Message not found'}), 404
+        # Soft delete in one statement, gated on the user being a participant
+        result = db.session.execute(
+            update(Message)
+            .where(Message.id == message_id,
+                   (Message.sender_id == user_id) | (Message.recipient_id == user_id))
+            .values(is_deleted=True, updated_at=datetime.utcnow())
+        )
 
-        # Check if user has permission to delete this message
-        if message.sender_id != user_id and message.recipient_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
+        if result.rowcount == 0:
+            db.session.rollback()
+            return message_access_error(message_id)
 
-        message.mark_as_deleted()
         db.session.commit()
 
         log_activity(
             user_id=user_id,
             action='message_deleted',
             resource_type='message',
-            resource_id=message.id,
+            resource_id=message_id,
             ip_address=request.remote_addr,
             user_agent=request.headers.get('User-Agent'),
             request_method=request.method,
@@ -269,16 +427,17 @@ def mark_message_read(message_id):
     try:
         user_id = get_jwt_identity()
 
-        message = Message.query.get(message_id)
-
-        if not message:
-            return jsonify({'error': 'Message not found'}), 404
-
         # Only recipient can mark as read
-        if message.recipient_id != user_id:
-            return jsonify({'error': 'Access denied'}), 403
+        result = db.session.execute(
+            update(Message)
+            .where(Message.id == message_id, Message.recipient_id == user_id)
+            .values(is_read=True, updated_at=datetime.utcnow())
+        )
+
+        if result.rowcount == 0:
+            db.session.rollback()
+            return message_access_error(message_id)
 
-        message.mark_as_read()
         db.session.commit()
 
         return jsonify({'message': 'Message marked as read'}), 200
@@ -289,6 +448,135 @@ def mark_message_read(message_id):
         return jsonify({'error': 'Failed to mark message as read'}), 500
 
 
+@messages_bp.route('/<int:message_id>/attachments/presign', methods=['POST'])
+@jwt_required()
+@limiter.limit("10 per minute")
+def presign_attachment(message_id):
+    """Get a presigned URL to upload an attachment directly to object storage."""
+    try:
+        user_id = get_jwt_identity()
+
+        if not object_storage_enabled():
+            return jsonify({'error': 'Direct attachment uploads are not enabled'}), 501
+
+        message = db.session.get(Message, message_id)
+        if not message:
+            return jsonify({'error': 'Message not found'}), 404
+
+        if message.sender_id != user_id:
+            return jsonify({'error': 'Access denied'}), 403
+
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        filename = data.get('filename', '')
+        attachment_type = data.get('attachment_type', 'file')
+        mime_type = data.get('mime_type') or 'application/octet-stream'
+        checksum = (data.get('checksum') or '').lower()
+
+        try:
+            file_size = int(data.get('file_size'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'file_size is required'}), 400
+
+        if not filename:
+            return jsonify({'error': 'No file selected'}), 400
+
+        if not allowed_file(filename, attachment_type):
+            return jsonify({'error': f'Invalid file type for {attachment_type}'}), 400
+
+        if file_size <= 0 or file_size > MAX_FILE_SIZE:
+            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
+
+        # Required so S3 verifies the upload; register_uploaded_attachment relies on it
+        if not SHA256_HEX_RE.match(checksum):
+            return jsonify({'error': 'checksum must be a hex SHA-256 digest'}), 400
+
+        key = f"messages/{message_id}/{secrets.token_hex(8)}_{secure_filename(filename)}"
+        upload_url = presign_attachment_upload(key, file_size, mime_type, checksum)
+
+        return jsonify({
+            'upload_url': upload_url,
+            'key': key,
+            'headers': {'Content-Type': mime_type},
+            'expires_in': current_app.config.get('S3_PRESIGN_EXPIRES', 300)
+        }), 200
+
+    except Exception as e:
+        log_error(current_app.logger, e)
+        return jsonify({'error': 'Failed to presign attachment upload'}), 500
+
+
+def register_uploaded_attachment(user_id, message):
+    """Record an attachment the client has already uploaded to object storage."""
+    message_id = message.id
+    data = request.get_json() or {}
+    key = data.get('key', '')
+    filename = data.get('filename', '')
+    attachment_type = data.get('attachment_type', 'file')
+    checksum = (data.get('checksum') or '').lower()
+
+    if not object_storage_enabled():
+        return jsonify({'error': 'Direct attachment uploads are not enabled'}), 501
+
+    # Keys are issued per message by presign_attachment
+    if not key.startswith(f"messages/{message_id}/") or not filename:
+        return jsonify({'error': 'Invalid attachment key'}), 400
+
+    if not allowed_file(filename, attachment_type):
+        return jsonify({'error': f'Invalid file type for {attachment_type}'}), 400
+
+    if not SHA256_HEX_RE.match(checksum):
+        return jsonify({'error': 'checksum must be a hex SHA-256 digest'}), 400
+
+    stored = head_attachment(key)
+    if not stored:
+        return jsonify({'error': 'Uploaded object not found'}), 400
+
+    if stored['size'] > MAX_FILE_SIZE:
+        return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
+
+    # The checksum is only trusted when S3 verified it on upload
+    if not stored['checksum']:
+        return jsonify({'error': 'Uploaded object has no verified checksum'}), 400
+
+    if stored['checksum'] != checksum:
+        return jsonify({'error': 'Checksum does not match uploaded object'}), 400
+
+    attachment = MessageAttachment(
+        message_id=message_id,
+        filename=key.rsplit('/', 1)[-1],
+        original_filename=filename,
+        file_size=stored['size'],
+        mime_type=data.get('mime_type'),
+        storage_path=key,
+        checksum=checksum,
+        attachment_type=attachment_type
+    )
+
+    db.session.add(attachment)
+    message.updated_at = datetime.utcnow()  # new ETag for the message and listings
+    db.session.commit()
+
+    log_activity(
+        user_id=user_id,
+        action='attachment_uploaded',
+        resource_type='message_attachment',
+        resource_id=attachment.id,
+        details={'message_id': message_id, 'filename': filename, 'storage': 's3'},
+        ip_address=request.remote_addr,
+        user_agent=request.headers.get('User-Agent'),
+        request_method=request.method,
+        request_path=request.path
+    )
+
+    return jsonify({
+        'message': 'Attachment uploaded successfully',
+        'attachment': attachment.to_dict()
+    }), 201
+
+
 @messages_bp.route('/<int:message_id>/attachments', methods=['POST'])
 @jwt_required()
 @limiter.limit("10 per minute")
@@ -298,13 +586,21 @@ def upload_attachment(message_id):
         user_id = get_jwt_identity()
 
         # Verify message exists and user has access
-        message = Message.query.get(message_id)
+        message = db.session.get(Message, message_id)
         if not message:
             return jsonify({'error': 'Message not found'}), 404
 
         if message.sender_id != user_id:
             return jsonify({'error': 'Access denied'}), 403
 
+        # JSON body: the file was uploaded straight to object storage
+        if request.is_json:
+            return register_uploaded_attachment(user_id, message)
+
+        # Reject oversized bodies from the header, before the upload is parsed
+        if request.content_length and request.content_length > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 413
+
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
 
@@ -318,14 +614,6 @@ def upload_attachment(message_id):
         if not allowed_file(file.filename, attachment_type):
             return jsonify({'error': f'Invalid file type for {attachment_type}'}), 400
 
-        # Validate file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
-
         # Generate secure filename and path
         filename = secure_filename(f"{message_id}_{file.filename}")
         filepath = os.path.join('uploads', 'messages', filename)
@@ -333,13 +621,13 @@ def upload_attachment(message_id):
         # Ensure directory exists
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
-        # Calculate checksum
-        file_content = file.read()
-        checksum = hashlib.sha256(file_content).hexdigest()
-
-        # Save file
-        with open(filepath, 'wb') as f:
-            f.write(file_content)
+        # Stream to a private partial file, hashing as we go and enforcing the size limit
+        part_path = f"{filepath}.part.{secrets.token_hex(4)}"
+        try:
+            file_size, checksum = save_with_checksum(file.stream, part_path, sync=True,
+                                                     max_size=MAX_FILE_SIZE)
+        except ValueError:
+            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
 
         # Create attachment record
         attachment = MessageAttachment(
@@ -354,8 +642,13 @@ def upload_attachment(message_id):
         )
 
         db.session.add(attachment)
+        message.updated_at = datetime.utcnow()  # new ETag for the message and listings
         db.session.commit()
 
+        # Publish the file only once its record is committed
+        os.replace(part_path, filepath)
+        part_path = None
+
         log_activity(
             user_id=user_id,
             action='attachment_uploaded',
@@ -376,6 +669,12 @@ def upload_attachment(message_id):
     except Exception as e:
         db.session.rollback()
         log_error(current_app.logger, e)
+        # Never leave a half-written upload behind
+        if locals().get('part_path'):
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
         return jsonify({'error': 'Failed to upload attachment'}), 500
 
 
@@ -387,9 +686,26 @@ def get_contacts():
     try:
         user_id = get_jwt_identity()
 
-        contacts = Contact.query.filter_by(user_id=user_id).order_by(Contact.name).all()
-
-        return jsonify({'contacts': [contact.to_dict() for contact in contacts]}), 200
+        # Select only the serialized columns and build dicts straight from the rows
+        rows = db.session.execute(
+            select(Contact.id, Contact.name, Contact.email, Contact.phone, Contact.company,
+                   Contact.notes, Contact.created_at, Contact.updated_at)
+            .where(Contact.user_id == user_id)
+            .order_by(Contact.name)
+        ).all()
+
+        contacts = [{
+            'id': row.id,
+            'name': row.name,
+            'email': row.email,
+            'phone': row.phone,
+            'company': row.company,
+            'notes': row.notes,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at
+        } for row in rows]
+
+        return jsonify({'contacts': contacts}), 200
 
     except Exception as e:
         log_error(current_app.logger, e)
@@ -409,11 +725,8 @@ def create_contact():
         if not data or not data.get('name'):
             return jsonify({'error': 'Contact name is required'}), 400
 
-        name = sanitize_text(data.get('name'))
-        email = data.get('email', '').strip().lower() if data.get('email') else None
-        phone = sanitize_text(data.get('phone', '')) if data.get('phone') else None
-        company = sanitize_text(data.get('company', '')) if data.get('company') else None
-        notes = sanitize_text(data.get('notes', '')) if data.get('notes') else None
+        email = data.get('email')
+        email = email.strip().lower() if email else None
 
         # Validate email if provided
         if email:
@@ -423,11 +736,9 @@ def create_contact():
 
         contact = Contact(
             user_id=user_id,
-            name=name,
+            name=sanitize_text(data['name']),
             email=email,
-            phone=phone,
-            company=company,
-            notes=notes
+            **{field: sanitize_text(data.get(field)) or None for field in CONTACT_TEXT_FIELDS}
         )
 
         db.session.add(contact)
@@ -472,12 +783,9 @@ def update_contact(contact_id):
                 if not email_valid:
                     return jsonify({'error': email_error}), 400
             contact.email = email
-        if 'phone' in data:
-            contact.phone = sanitize_text(data['phone']) if data['phone'] else None
-        if 'company' in data:
-            contact.company = sanitize_text(data['company']) if data['company'] else None
-        if 'notes' in data:
-            contact.notes = sanitize_text(data['notes']) if data['notes'] else None
+        for field in CONTACT_TEXT_FIELDS:
+            if field in data:
+                setattr(contact, field, sanitize_text(data[field]) or None)
 
         contact.updated_at = datetime.utcnow()
         db.session.commit()
@@ -6,11 +6,165 @@ Handles file sharing, link management, and access control.
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
+import hashlib
+import hmac
+from sqlalchemy import case, func, tuple_, update
+from sqlalchemy.orm import defer, joinedload, load_only, selectinload
 from .. import db, limiter
 from ..models import User, File, Share
+from .files import send_stored_file
+from ..utils.cache import cache_get, cache_set, cache_delete, row_snapshot, row_restore
+from ..utils.pagination import encode_cursor, decode_cursor
 
 shares_bp = Blueprint('shares', __name__)
 
+# Public share lookups are cached briefly so bursts on one link skip the database
+SHARE_CACHE_TTL = 10  # seconds
+
+# Successful share password checks are remembered so repeat hits skip the KDF
+SHARE_PASSWORD_CACHE_TTL = 60  # seconds
+
+
+# Column allow-lists for cached lookups. Password hashes, device
+# fingerprints, key material and disk paths stay out of Redis.
+SHARE_CACHE_COLUMNS = (
+    'id', 'share_link', 'is_active', 'expires_at', 'max_downloads', 'download_count',
+    'unlock_time', 'is_one_time', 'allowed_countries', 'allowed_cities',
+    'center_lat', 'center_lng', 'max_distance_km', 'created_at', 'last_accessed',
+    'file_id', 'sharer_id', 'recipient_id',
+)
+FILE_CACHE_COLUMNS = (
+    'id', 'original_filename', 'file_size', 'mime_type', 'checksum',
+    'user_id', 'upload_date', 'is_deleted',
+)
+
+
+def share_cache_key(share_link):
+    """Redis key for a cached public share lookup."""
+    return f"share:{share_link}"
+
+
+def get_share_cached(share_link):
+    """
+    Look up a public share and its file, through the shared cache.
+
+    Both instances are detached snapshots; record downloads with
+    record_share_download() rather than by modifying them. Shares protected
+    by a password or device fingerprint are never cached, and a cached file
+    lacks its key material and storage path until load_file_secrets().
+
+    Returns:
+        Tuple of (share, file), or (None, None) if the link does not exist
+    """
+    key = share_cache_key(share_link)
+    cached = cache_get(key)
+    if cached:
+        return row_restore(Share, cached['share']), row_restore(File, cached['file'])
+
+    share = Share.query.options(joinedload(Share.file)).filter_by(share_link=share_link).first()
+    if not share:
+        return None, None
+
+    file = share.file
+    if not share.password_hash and not share.device_fingerprint:
+        cache_set(key, {
+            'share': row_snapshot(share, SHARE_CACHE_COLUMNS),
+            'file': row_snapshot(file, FILE_CACHE_COLUMNS)
+        }, SHARE_CACHE_TTL)
+    db.session.expunge(share)
+    db.session.expunge(file)
+    return share, file
+
+
+def load_file_secrets(file):
+    """Read the uncached storage path and key material of a shared file."""
+    if file.storage_path is not None:
+        return
+    file.storage_path, file.encryption_iv, file.encryption_salt = db.session.query(
+        File.storage_path, File.encryption_iv, File.encryption_salt
+    ).filter_by(id=file.id).one()
+
+
+def check_share_password(share, password):
+    """
+    Verify a share password, remembering successful checks for a minute.
+
+    The cache key is an HMAC of the share, its password hash and the
+    candidate password under SECRET_KEY, so Redis never holds anything
+    that can be brute-forced offline; a new password hash changes the key.
+    """
+    if not share.password_hash:
+        return True
+    if not password:
+        return False
+
+    digest = hmac.new(
+        current_app.config['SECRET_KEY'].encode(),
+        f"{share.id}:{share.password_hash}:{password}".encode(),
+        hashlib.sha256
+    ).hexdigest()
+    key = f"sharepw:{digest}"
+
+    if cache_get(key):
+        return True
+    if not share.check_password(password):
+        return False
+    cache_set(key, 1, SHARE_PASSWORD_CACHE_TTL)
+    return True
+
+
+def record_share_download(share):
+    """
+    Count a download in one UPDATE and keep the caller's snapshot in step.
+
+    The UPDATE only matches while the share is active, unexpired and under
+    its download limit, so concurrent requests cannot overrun max_downloads.
+
+    Returns:
+        True if the download was recorded, False if the share can no longer be used
+    """
+    now = datetime.utcnow()
+    values = {'download_count': Share.download_count + 1, 'last_accessed': now}
+    if share.is_one_time:
+        values['is_active'] = False
+
+    result = db.session.execute(
+        update(Share)
+        .where(Share.id == share.id,
+               Share.is_active == True,
+               (Share.expires_at == None) | (Share.expires_at > now),
+               (Share.max_downloads == -1) | (Share.download_count < Share.max_downloads))
+        .values(**values)
+    )
+    db.session.commit()
+
+    if result.rowcount == 0:
+        # Another request used up or revoked the share; drop the stale snapshot
+        cache_delete(share_cache_key(share.share_link))
+        return False
+
+    share.download_count += 1
+    share.last_accessed = now
+    if share.is_one_time:
+        share.is_active = False
+
+    # Cached counts only matter when they gate access
+    if share.is_one_time or share.max_downloads != -1:
+        cache_delete(share_cache_key(share.share_link))
+    return True
+
+
+def serialize_share_listing(share):
+    """Serialize a share for the owner's share list, with its file summary."""
+    share_dict = share.to_dict()
+    share_dict['file'] = {
+        'id': share.file.id,
+        'filename': share.file.original_filename,
+        'file_size': share.file.file_size,
+        'size_mb': share.file.size_mb
+    }
+    return share_dict
+
 
 @shares_bp.route('', methods=['POST'])
 @jwt_required()
@@ -100,16 +254,44 @@ def list_shares():
         # Query parameters
         page = int(request.args.get('page', 1))
         per_page = min(int(request.args.get('per_page', 20)), 100)
+        cursor = request.args.get('cursor')  # keyset pagination; page is ignored when set
         active_only = request.args.get('active_only', 'true').lower() == 'true'
 
-        # Build query
-        query = Share.query.filter_by(sharer_id=user_id)
+        # Build query; the page's files are fetched in one extra IN query,
+        # loading only the columns the listing shows
+        query = Share.query.options(
+            defer(Share.password_hash),
+            selectinload(Share.file).load_only(File.original_filename, File.file_size)
+        ).filter_by(sharer_id=user_id)
 
+        # Served by ix_shares_sharer_active_exp; expiry is compared against
+        # utcnow() because expires_at is stored as naive UTC, not server time
         if active_only:
             query = query.filter_by(is_active=True).filter(
                 Share.expires_at > datetime.utcnow()
             )
 
+        # Keyset pagination on (created_at, id), skipping the COUNT query
+        if cursor is not None:
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                query = query.filter(tuple_(Share.created_at, Share.id) < position)
+
+            shares = query.order_by(Share.created_at.desc(), Share.id.desc()).limit(per_page + 1).all()
+            has_next = len(shares) > per_page
+            shares = shares[:per_page]
+
+            return jsonify({
+                'shares': [serialize_share_listing(share) for share in shares],
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': encode_cursor(shares[-1].created_at, shares[-1].id) if has_next else None
+                }
+            }), 200
+
         # Order by creation date
         query = query.order_by(Share.created_at.desc())
 
@@ -117,20 +299,8 @@ def list_shares():
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
         shares = pagination.items
 
-        # Include file information
-        shares_data = []
-        for share in shares:
-            share_dict = share.to_dict()
-            share_dict['file'] = {
-                'id': share.file.id,
-                'filename': share.file.original_filename,
-                'file_size': share.file.file_size,
-                'size_mb': share.file.size_mb
-            }
-            shares_data.append(share_dict)
-
         return jsonify({
-            'shares': shares_data,
+            'shares': [serialize_share_listing(share) for share in shares],
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -151,7 +321,7 @@ def access_share(share_link):
     """Access a shared file (public endpoint)."""
     try:
         # Find share by link
-        share = Share.query.filter_by(share_link=share_link).first()
+        share, file = get_share_cached(share_link)
 
         if not share:
             return jsonify({'error': 'Share link not found'}), 404
@@ -175,8 +345,7 @@ def access_share(share_link):
             }), 423  # Locked
 
         # Check password if required
-        password = request.args.get('password')
-        if not share.check_password(password):
+        if not check_share_password(share, request.args.get('password')):
             return jsonify({'error': 'Invalid password'}), 401
 
         # Check geofence restrictions
@@ -198,21 +367,23 @@ def access_share(share_link):
             return jsonify({'error': device_message}), 403
 
         # Record access
-        share.record_download()
-        db.session.commit()
+        if not record_share_download(share):
+            return jsonify({'error': 'Download limit exceeded'}), 429
+
+        load_file_secrets(file)
 
         # Return file information
         file_info = {
-            'id': share.file.id,
-            'filename': share.file.original_filename,
-            'file_size': share.file.file_size,
-            'size_mb': share.file.size_mb,
-            'mime_type': share.file.mime_type,
-            'checksum': share.file.checksum,
-            'upload_date': share.file.upload_date.isoformat() if share.file.upload_date else None,
-            'is_encrypted': share.file.is_encrypted,
-            'encryption_iv': share.file.encryption_iv,
-            'encryption_salt': share.file.encryption_salt,
+            'id': file.id,
+            'filename': file.original_filename,
+            'file_size': file.file_size,
+            'size_mb': file.size_mb,
+            'mime_type': file.mime_type,
+            'checksum': file.checksum,
+            'upload_date': file.upload_date.isoformat() if file.upload_date else None,
+            'is_encrypted': file.is_encrypted,
+            'encryption_iv': file.encryption_iv,
+            'encryption_salt': file.encryption_salt,
             'share_info': {
                 'expires_at': share.expires_at.isoformat() if share.expires_at else None,
                 'downloads_remaining': share.downloads_remaining,
@@ -231,10 +402,8 @@ def access_share(share_link):
 def download_shared_file(share_link):
     """Download a shared file (public endpoint)."""
     try:
-        from flask import send_file
-
         # Find share by link
-        share = Share.query.filter_by(share_link=share_link).first()
+        share, file = get_share_cached(share_link)
 
         if not share:
             return jsonify({'error': 'Share link not found'}), 404
@@ -258,8 +427,7 @@ def download_shared_file(share_link):
             }), 423  # Locked
 
         # Check password if required
-        password = request.args.get('password')
-        if not share.check_password(password):
+        if not check_share_password(share, request.args.get('password')):
             return jsonify({'error': 'Invalid password'}), 401
 
         # Check geofence restrictions
@@ -281,20 +449,16 @@ def download_shared_file(share_link):
             return jsonify({'error': device_message}), 403
 
         # Check if file exists
-        if not share.file.file_exists:
+        load_file_secrets(file)
+        if not file.file_exists:
             return jsonify({'error': 'File not found on disk'}), 404
 
         # Record download
-        share.record_download()
-        db.session.commit()
+        if not record_share_download(share):
+            return jsonify({'error': 'Download limit exceeded'}), 429
 
-        # Send file
-        return send_file(
-            share.file.storage_path,
-            as_attachment=True,
-            download_name=share.file.original_filename,
-            mimetype=share.file.mime_type
-        )
+        # Send file (offloaded to nginx via X-Accel-Redirect when enabled)
+        return send_stored_file(file.storage_path, file.original_filename, file.mime_type)
 
     except Exception as e:
         return jsonify({'error': 'File download failed', 'details': str(e)}), 500
@@ -315,6 +479,7 @@ def revoke_share(share_id):
 
         share.revoke()
         db.session.commit()
+        cache_delete(share_cache_key(share.share_link))
 
         return jsonify({'message': 'Share link revoked successfully'}), 200
 
@@ -341,6 +506,7 @@ def extend_share(share_id):
 
         share.extend_expiry(days)
         db.session.commit()
+        cache_delete(share_cache_key(share.share_link))
 
         return jsonify({
             'message': f'Share extended by {days} days',
@@ -360,19 +526,23 @@ def get_share_stats():
     try:
         user_id = get_jwt_identity()
 
-        # Get share statistics
-        total_shares = Share.query.filter_by(sharer_id=user_id).count()
-        active_shares = Share.query.filter_by(sharer_id=user_id, is_active=True).filter(
-            Share.expires_at > datetime.utcnow()
-        ).count()
-        total_downloads = db.session.query(db.func.sum(Share.download_count)).filter_by(
-            sharer_id=user_id
-        ).scalar() or 0
+        # Get share statistics in one pass over the user's shares
+        total_shares, active_shares, total_downloads = db.session.query(
+            func.count(Share.id),
+            func.count(case(
+                ((Share.is_active == True) & (Share.expires_at > datetime.utcnow()), 1)
+            )),
+            func.coalesce(func.sum(Share.download_count), 0)
+        ).filter(Share.sharer_id == user_id).one()
 
         # Recent shares
-        recent_shares = Share.query.filter_by(sharer_id=user_id).order_by(
-            Share.created_at.desc()
-        ).limit(5).all()
+        recent_shares = Share.query.options(
+            load_only(Share.share_link, Share.created_at, Share.download_count,
+                      Share.is_active, Share.expires_at, Share.file_id),
+            selectinload(Share.file).load_only(File.original_filename)
+        ).filter_by(
+            sharer_id=user_id
+        ).order_by(Share.created_at.desc()).limit(5).all()
 
         recent_shares_data = []
         for share in recent_shares:
@@ -3,13 +3,96 @@ User management routes for Cryptee application.
 Handles user profile management and administrative functions.
 """
 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import desc, literal, null, select, tuple_, type_coerce, union_all, update
 from .. import db, limiter
-from ..models import User
+from ..models import User, File, Share
+from ..utils.pagination import encode_cursor, decode_cursor
 
 users_bp = Blueprint('users', __name__)
 
+MAX_PROFILE_PICTURE_SIZE = 2 * 1024 * 1024  # 2MB
+PROFILE_PICTURE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif'})
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for form fields and part headers
+
+# Profile pictures are written to disk off the request thread
+_picture_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='profile-picture')
+
+# Latest picture job per user in this process, reported by the status endpoint
+_picture_jobs = {}
+_picture_jobs_lock = threading.Lock()
+
+# Outcomes of store_profile_picture
+PICTURE_STORED = 'ready'
+PICTURE_FAILED = 'failed'
+PICTURE_SUPERSEDED = 'superseded'
+
+
+def store_profile_picture(app, user_id, data, filepath, previous):
+    """
+    Write a profile picture through a temporary part file, then point the user at it.
+
+    The path is recorded only once the file is in place, so a failed write
+    leaves the previous picture untouched and the user never references a
+    missing file. The UPDATE only applies while the user still has the
+    picture they had at upload time, so a delete or another upload that
+    lands first is not undone.
+
+    Returns:
+        PICTURE_STORED, PICTURE_FAILED or PICTURE_SUPERSEDED
+    """
+    part_path = f"{filepath}.part.{secrets.token_hex(4)}"
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(part_path, 'wb') as f:
+            f.write(data)
+        os.replace(part_path, filepath)
+    except OSError as e:
+        app.logger.error(f"Failed to store profile picture {filepath}: {e}")
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return PICTURE_FAILED
+
+    with app.app_context():
+        try:
+            result = db.session.execute(
+                update(User)
+                .where(User.id == user_id,
+                       User.profile_picture.is_not_distinct_from(previous))
+                .values(profile_picture=filepath)
+            )
+            db.session.commit()
+            if result.rowcount:
+                return PICTURE_STORED
+
+            # The picture changed meanwhile; drop the file unless someone uses it
+            referenced = db.session.query(
+                select(User.id).where(User.profile_picture == filepath).exists()
+            ).scalar()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to record profile picture {filepath}: {e}")
+            return PICTURE_FAILED
+
+    if not referenced:
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+    return PICTURE_SUPERSEDED
+
+
+def is_admin():
+    """Check the role claim issued with the access token, without a database lookup."""
+    return get_jwt().get('role') == 'admin'
+
 
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
@@ -115,22 +198,17 @@ def get_storage_info():
     """Get user's storage usage information."""
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
 
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        # Calculate storage usage
-        from app.models import File
-        total_size = db.session.query(db.func.sum(File.file_size)).filter_by(
-            user_id=user_id, is_deleted=False
-        ).scalar() or 0
-
-        file_count = File.query.filter_by(user_id=user_id, is_deleted=False).count()
+        # Calculate storage usage in one pass (covered by ix_files_user_live_size)
+        total_size, file_count = db.session.query(
+            db.func.coalesce(db.func.sum(File.file_size), 0),
+            db.func.count(File.id)
+        ).filter(File.user_id == user_id, File.is_deleted == False).one()
 
-        # Storage limits (could be configurable per user/role)
+        # Storage limits (could be configurable per user/role); the role comes
+        # from the access token claim, so no user row is loaded
         storage_limit = 100 * 1024 * 1024  # 100MB default
-        if user.role == 'admin':
+        if is_admin():
             storage_limit = 1024 * 1024 * 1024  # 1GB for admins
 
         return jsonify({
@@ -155,55 +233,66 @@ def get_activity():
     """Get user's recent activity."""
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
 
         # Query parameters
         limit = min(int(request.args.get('limit', 20)), 100)
 
-        # Get recent files
-        recent_files = user.files.filter_by(is_deleted=False).order_by(
-            user.files.upload_date.desc()
-        ).limit(limit).all()
+        # Newest uploads and newest shares, each cut to the limit on its own index,
+        # then merged, sorted and limited again by the database in one round-trip
+        recent_files = select(
+            literal('file_upload').label('type'),
+            File.id.label('id'),
+            File.upload_date.label('ts'),
+            File.original_filename.label('filename'),
+            File.file_size.label('file_size'),
+            File.mime_type.label('mime_type'),
+            null().label('share_link'),
+            type_coerce(null(), Share.expires_at.type).label('expires_at')
+        ).where(
+            File.user_id == user_id, File.is_deleted == False
+        ).order_by(File.upload_date.desc()).limit(limit).subquery()
+
+        recent_shares = select(
+            literal('share_created').label('type'),
+            Share.id.label('id'),
+            Share.created_at.label('ts'),
+            File.original_filename.label('filename'),
+            type_coerce(null(), File.file_size.type).label('file_size'),
+            null().label('mime_type'),
+            Share.share_link.label('share_link'),
+            Share.expires_at.label('expires_at')
+        ).join(File, Share.file_id == File.id).where(
+            Share.sharer_id == user_id
+        ).order_by(Share.created_at.desc()).limit(limit).subquery()
+
+        rows = db.session.execute(
+            union_all(select(recent_files), select(recent_shares))
+            .order_by(desc('ts')).limit(limit)
+        ).all()
 
-        # Get recent shares created
-        recent_shares = user.shares_created.order_by(
-            user.shares_created.created_at.desc()
-        ).limit(limit).all()
-
-        # Combine and sort activities
         activities = []
-
-        for file in recent_files:
-            activities.append({
-                'type': 'file_upload',
-                'id': file.id,
-                'description': f'Uploaded {file.original_filename}',
-                'timestamp': file.upload_date.isoformat() if file.upload_date else None,
-                'metadata': {
-                    'file_size': file.size_mb,
-                    'mime_type': file.mime_type
+        for row in rows:
+            if row.type == 'file_upload':
+                description = f'Uploaded {row.filename}'
+                metadata = {
+                    'file_size': round(row.file_size / (1024 * 1024), 2),
+                    'mime_type': row.mime_type
+                }
+            else:
+                description = f'Shared {row.filename}'
+                metadata = {
+                    'share_link': row.share_link[:16] + '...',
+                    'expires_at': row.expires_at.isoformat() if row.expires_at else None
                 }
-            })
 
-        for share in recent_shares:
             activities.append({
-                'type': 'share_created',
-                'id': share.id,
-                'description': f'Shared {share.file.original_filename}',
-                'timestamp': share.created_at.isoformat() if share.created_at else None,
-                'metadata': {
-                    'share_link': share.share_link[:16] + '...',
-                    'expires_at': share.expires_at.isoformat() if share.expires_at else None
-                }
+                'type': row.type,
+                'id': row.id,
+                'description': description,
+                'timestamp': row.ts.isoformat() if row.ts else None,
+                'metadata': metadata
             })
 
-        # Sort by timestamp descending
-        activities.sort(key=lambda x: x['timestamp'] or '', reverse=True)
-        activities = activities[:limit]
-
         return jsonify({'activities': activities}), 200
 
     except Exception as e:
@@ -217,28 +306,29 @@ def get_activity():
 def list_users():
     """List all users (admin only)."""
     try:
-        user_id = get_jwt_identity()
-        current_user = User.query.get(user_id)
-
-        if not current_user or current_user.role != 'admin':
+        if not is_admin():
             return jsonify({'error': 'Admin access required'}), 403
 
         # Query parameters
         page = int(request.args.get('page', 1))
         per_page = min(int(request.args.get('per_page', 20)), 100)
+        cursor = request.args.get('cursor')  # keyset pagination; page is ignored when set
         search = request.args.get('search', '').strip()
         role_filter = request.args.get('role')
 
         # Build query
         query = User.query
 
-        # Apply search filter
+        # Apply search filter as a prefix match so each branch is an index
+        # range scan; LIKE is case-insensitive under MySQL's default collation
+        # and SQLite's NOCASE indexes, and emails are stored lowercase
         if search:
+            pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
             query = query.filter(
                 db.or_(
-                    User.email.ilike(f'%{search}%'),
-                    User.first_name.ilike(f'%{search}%'),
-                    User.last_name.ilike(f'%{search}%')
+                    User.email.like(pattern.lower(), escape='\\'),
+                    User.first_name.like(pattern, escape='\\'),
+                    User.last_name.like(pattern, escape='\\')
                 )
             )
 
@@ -246,6 +336,27 @@ def list_users():
         if role_filter:
             query = query.filter_by(role=role_filter)
 
+        # Keyset pagination on (created_at, id), skipping the COUNT query
+        if cursor is not None:
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                query = query.filter(tuple_(User.created_at, User.id) < position)
+
+            users = query.order_by(User.created_at.desc(), User.id.desc()).limit(per_page + 1).all()
+            has_next = len(users) > per_page
+            users = users[:per_page]
+
+            return jsonify({
+                'users': [user.to_dict(include_sensitive=True) for user in users],
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': encode_cursor(users[-1].created_at, users[-1].id) if has_next else None
+                }
+            }), 200
+
         # Order by creation date
         query = query.order_by(User.created_at.desc())
 
@@ -275,10 +386,7 @@ def list_users():
 def update_user_status(user_id):
     """Update user status (admin only)."""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-
-        if not current_user or current_user.role != 'admin':
+        if not is_admin():
             return jsonify({'error': 'Admin access required'}), 403
 
         user = User.query.get(user_id)
@@ -316,19 +424,18 @@ def update_user_status(user_id):
 def delete_user(user_id):
     """Delete a user account (admin only)."""
     try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-
-        if not current_user or current_user.role != 'admin':
+        if not is_admin():
             return jsonify({'error': 'Admin access required'}), 403
 
+        current_user_id = get_jwt_identity()
+
         user = User.query.get(user_id)
 
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
         # Prevent self-deletion
-        if user.id == current_user.id:
+        if user.id == current_user_id:
             return jsonify({'error': 'Cannot delete your own account'}), 400
 
         # Delete user (cascade will handle related records)
@@ -354,6 +461,10 @@ def upload_profile_picture():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
+        # Reject oversized bodies from the header, before the upload is parsed
+        if request.content_length and request.content_length > MAX_PROFILE_PICTURE_SIZE + MULTIPART_OVERHEAD:
+            return jsonify({'error': 'File too large. Maximum size is 2MB'}), 400
+
         if 'profile_picture' not in request.files:
             return jsonify({'error': 'No profile picture file provided'}), 400
 
@@ -363,42 +474,70 @@ def upload_profile_picture():
             return jsonify({'error': 'No file selected'}), 400
 
         # Validate file type
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
-        if not file.filename.lower().split('.')[-1] in allowed_extensions:
+        ext = os.path.splitext(file.filename)[1].lower().lstrip('.')
+        if ext not in PROFILE_PICTURE_EXTENSIONS:
             return jsonify({'error': 'Invalid file type. Only PNG, JPG, JPEG, and GIF are allowed'}), 400
 
-        # Validate file size (max 2MB)
-        if len(file.read()) > 2 * 1024 * 1024:
+        # Validate file size (max 2MB) by seeking the spooled part instead of reading it
+        file.stream.seek(0, os.SEEK_END)
+        size = file.stream.tell()
+        file.stream.seek(0)
+        if size > MAX_PROFILE_PICTURE_SIZE:
             return jsonify({'error': 'File too large. Maximum size is 2MB'}), 400
 
-        file.seek(0)  # Reset file pointer
-
         # Generate unique filename
-        import os
         from werkzeug.utils import secure_filename
 
         filename = secure_filename(f"{user_id}_{file.filename}")
         filepath = os.path.join('uploads', 'profiles', filename)
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        # Hand the (size-capped) bytes to the writer pool and return immediately;
+        # the worker records the new path once the file is written
+        job = _picture_executor.submit(store_profile_picture, current_app._get_current_object(),
+                                       user_id, file.read(), filepath, user.profile_picture)
+        with _picture_jobs_lock:
+            _picture_jobs[user_id] = (filepath, job)
+
+        return jsonify({
+            'message': 'Profile picture accepted',
+            'status': 'processing',
+            'pending_profile_picture': filepath,
+            'status_url': url_for('users.get_profile_picture_status')
+        }), 202
 
-        # Save file
-        file.save(filepath)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Profile picture upload failed', 'details': str(e)}), 500
 
-        # Update user profile picture path
-        user.profile_picture = filepath
-        db.session.commit()
+
+@users_bp.route('/profile/picture/status', methods=['GET'])
+@jwt_required()
+@limiter.limit("60 per minute")
+def get_profile_picture_status():
+    """Get the state of the current user's latest profile picture upload."""
+    try:
+        user_id = get_jwt_identity()
+
+        with _picture_jobs_lock:
+            filepath, job = _picture_jobs.get(user_id, (None, None))
+
+        if job is None:
+            status = PICTURE_STORED  # Nothing pending in this process
+        elif not job.done():
+            status = 'processing'
+        else:
+            status = job.result()
+
+        current = db.session.query(User.profile_picture).filter_by(id=user_id).scalar()
 
         return jsonify({
-            'message': 'Profile picture uploaded successfully',
-            'profile_picture': filepath,
-            'user': user.to_dict()
+            'status': status,
+            'pending_profile_picture': filepath if status == 'processing' else None,
+            'profile_picture': current
         }), 200
 
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'Profile picture upload failed', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to get profile picture status', 'details': str(e)}), 500
 
 
 @users_bp.route('/profile/picture', methods=['DELETE'])
@@ -417,7 +556,6 @@ def delete_profile_picture():
             return jsonify({'error': 'No profile picture to delete'}), 400
 
         # Delete file from filesystem
-        import os
         if os.path.exists(user.profile_picture):
             os.remove(user.profile_picture)
 
@@ -0,0 +1,89 @@
+"""
+Deferred file access tracking for Cryptee application.
+Buffers last-accessed timestamps in memory and writes them in batches.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    """Collect file access timestamps and flush them periodically."""
+
+    def __init__(self, app=None):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.app = None
+        self.flush_interval = 30
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the tracker to an application."""
+        self.app = app
+        self.flush_interval = app.config.get('FILE_ACCESS_FLUSH_INTERVAL', 30)
+        atexit.register(self.flush)
+
+    def record(self, file_id, accessed_at=None):
+        """Queue a last-accessed update for a file."""
+        with self._lock:
+            self._pending[file_id] = accessed_at or datetime.utcnow()
+        self._ensure_worker()
+
+    def flush(self):
+        """
+        Write all queued timestamps in a single batch.
+
+        Returns:
+            Number of files updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending or not self.app:
+            return 0
+
+        from ..models import File
+
+        with self.app.app_context():
+            try:
+                db.session.bulk_update_mappings(File, [
+                    {'id': file_id, 'last_accessed': accessed_at}
+                    for file_id, accessed_at in pending.items()
+                ])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to flush file access times: {e}")
+                return 0
+            finally:
+                db.session.remove()
+
+        return len(pending)
+
+    def _ensure_worker(self):
+        """Start the background flush thread on first use."""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='access-tracker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+# Global tracker instance (bound in create_app)
+access_tracker = AccessTracker()
@@ -3,9 +3,15 @@ Audit trail utilities for Cryptee application.
 Tracks file access, modifications, and user activities.
 """
 
+import atexit
+import queue
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, Optional
-from flask import current_app
+from typing import Dict, Any, List, Optional
+from flask import after_this_request, current_app, g, has_request_context
+from sqlalchemy import bindparam, delete, func, select, tuple_
 from .. import db
 
 
@@ -13,6 +19,13 @@ class AuditLog(db.Model):
     """Audit log model for tracking system activities."""
 
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Per-user activity summaries and history: one range scan on (user, time)
+        db.Index('ix_audit_user_time_action', 'user_id', 'timestamp', 'action'),
+        # Filtered audit listings read newest-first straight from the index
+        db.Index('ix_audit_action_time', 'action', 'timestamp'),
+        db.Index('ix_audit_status_time', 'status', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -33,7 +46,7 @@ class AuditLog(db.Model):
     request_path = db.Column(db.String(500))
 
     # Additional metadata
-    details = db.Column(db.Text)  # JSON string with additional information
+    details = db.Column(db.JSON(none_as_null=True))  # Additional information, (de)serialized by the driver
     status = db.Column(db.String(20), default='success')  # success, failure, warning
 
     # Relationships
@@ -56,13 +69,10 @@ class AuditLog(db.Model):
         self.user_email = user_email
 
         if details:
-            import json
-            self.details = json.dumps(details)
+            self.details = details
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert audit log to dictionary."""
-        import json
-
         data = {
             'id': self.id,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
@@ -79,22 +89,121 @@ class AuditLog(db.Model):
         }
 
         if self.details:
-            try:
-                data['details'] = json.loads(self.details)
-            except json.JSONDecodeError:
-                data['details'] = self.details
+            data['details'] = self.details
 
         return data
 
 
+class AuditWriter:
+    """Queue audit log entries and insert them in batches from a background thread."""
+
+    def __init__(self, app=None):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.app = None
+        self.flush_interval = 1
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the writer to an application."""
+        self.app = app
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 1)
+        atexit.register(self.flush)
+
+    def enqueue(self, entry: Dict[str, Any]):
+        """Queue a fully serialized audit log row for insertion."""
+        self._queue.put(entry)
+        self._ensure_worker()
+
+    def flush(self) -> int:
+        """
+        Insert all queued entries in a single batch.
+
+        Returns:
+            Number of entries written
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if not batch or not self.app:
+            return 0
+
+        with self.app.app_context():
+            try:
+                db.session.bulk_insert_mappings(AuditLog, batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Failed to write {len(batch)} audit log entries: {e}")
+                return 0
+            finally:
+                db.session.remove()
+
+        return len(batch)
+
+    def _ensure_worker(self):
+        """Start the background flush thread on first use."""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+# Rows removed per transaction when pruning old audit logs
+CLEANUP_BATCH_SIZE = 10000
+
+# Global writer instance (bound in create_app)
+audit_writer = AuditWriter()
+
+
+def _write_after_response(entry: Dict[str, Any]):
+    """Collect a synchronous audit entry; the request's entries are inserted together once it finishes."""
+    pending = g.get('audit_entries')
+    if pending is None:
+        pending = g.audit_entries = []
+
+        @after_this_request
+        def write_audit_entries(response):
+            g.pop('audit_entries', None)
+            try:
+                db.session.execute(AuditLog.__table__.insert(), pending)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Failed to write {len(pending)} audit log entries: {e}")
+            return response
+
+    pending.append(entry)
+
+
 def log_activity(user_id: int, action: str, resource_type: str,
                 resource_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None,
                 status: str = 'success', ip_address: str = None,
                 user_agent: str = None, request_method: str = None,
-                request_path: str = None, user_email: str = None) -> AuditLog:
+                request_path: str = None, user_email: str = None) -> bool:
     """
     Log an activity to the audit trail.
 
+    With AUDIT_LOG_ASYNC enabled the entry is queued and written by the
+    background audit writer; otherwise a request's entries are committed
+    together after its response is built, and entries logged outside a
+    request are committed immediately.
+
     Args:
         user_id: ID of the user performing the action
         action: Action performed (upload, download, share, delete, etc.)
@@ -109,25 +218,31 @@ def log_activity(user_id: int, action: str, resource_type: str,
         user_email: User email for historical reference
 
     Returns:
-        Created AuditLog instance
+        True if the entry was queued or written, False on error
     """
     try:
-        audit_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            details=details,
-            status=status,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            request_method=request_method,
-            request_path=request_path,
-            user_email=user_email
-        )
-
-        db.session.add(audit_log)
-        db.session.commit()
+        entry = {
+            'timestamp': datetime.utcnow(),
+            'user_id': user_id,
+            'user_email': user_email,
+            'action': action,
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'request_method': request_method,
+            'request_path': request_path,
+            'details': details or None,
+            'status': status
+        }
+
+        if audit_writer.app is not None and current_app.config.get('AUDIT_LOG_ASYNC', True):
+            audit_writer.enqueue(entry)
+        elif has_request_context():
+            _write_after_response(entry)
+        else:
+            db.session.execute(AuditLog.__table__.insert(), entry)
+            db.session.commit()
 
         # Log to application logger as well
         logger = current_app.logger
@@ -143,21 +258,63 @@ def log_activity(user_id: int, action: str, resource_type: str,
         else:
             logger.warning(log_message)
 
-        return audit_log
+        return True
 
     except Exception as e:
         # Don't let audit logging break the main application
         current_app.logger.error(f"Failed to log audit activity: {e}")
         db.session.rollback()
-        return None
+        return False
+
+
+@dataclass(frozen=True, slots=True)
+class AuditRow:
+    """Audit log entry as returned by get_audit_logs; orjson serializes it (datetimes included) directly."""
+
+    id: int
+    timestamp: Optional[datetime]
+    user_id: Optional[int]
+    user_email: Optional[str]
+    action: str
+    resource_type: str
+    resource_id: Optional[int]
+    ip_address: Optional[str]
+    request_method: Optional[str]
+    request_path: Optional[str]
+    status: Optional[str]
+    user_agent: Optional[str] = None
+    details: Optional[Any] = None
+
+
+# Columns returned by get_audit_logs; the large TEXT columns only on request
+_SUMMARY_COLUMNS = (
+    AuditLog.id, AuditLog.timestamp, AuditLog.user_id, AuditLog.user_email,
+    AuditLog.action, AuditLog.resource_type, AuditLog.resource_id,
+    AuditLog.ip_address, AuditLog.request_method, AuditLog.request_path,
+    AuditLog.status
+)
+_DETAIL_COLUMNS = (AuditLog.user_agent, AuditLog.details)
 
 
 def get_audit_logs(user_id: Optional[int] = None, action: Optional[str] = None,
                   resource_type: Optional[str] = None, status: Optional[str] = None,
-                  limit: int = 100, offset: int = 0) -> list:
+                  limit: int = 100, offset: int = 0,
+                  before_timestamp: Optional[datetime] = None,
+                  before_id: Optional[int] = None,
+                  include_details: bool = True) -> List[AuditRow]:
     """
     Retrieve audit logs with optional filtering.
 
+    Rows are read as plain column tuples rather than ORM instances and
+    returned as AuditRow records, which jsonify serializes without an
+    intermediate dict. With
+    include_details=False the user_agent and details columns are not
+    selected at all, which is what summary listings should use.
+
+    Pass the timestamp and id of the last entry already seen as
+    before_timestamp/before_id to page by key instead of by offset; the
+    offset is ignored then, so deep pages cost the same as the first.
+
     Args:
         user_id: Filter by user ID
         action: Filter by action
@@ -165,12 +322,16 @@ def get_audit_logs(user_id: Optional[int] = None, action: Optional[str] = None,
         status: Filter by status
         limit: Maximum number of records to return
         offset: Number of records to skip
+        before_timestamp: Return entries older than this one (keyset pagination)
+        before_id: Id of the entry at before_timestamp
+        include_details: Also return user_agent and details
 
     Returns:
-        List of audit log dictionaries
+        List of AuditRow records
     """
     try:
-        query = AuditLog.query
+        columns = _SUMMARY_COLUMNS + _DETAIL_COLUMNS if include_details else _SUMMARY_COLUMNS
+        query = db.session.query(*columns)
 
         if user_id:
             query = query.filter_by(user_id=user_id)
@@ -181,16 +342,32 @@ def get_audit_logs(user_id: Optional[int] = None, action: Optional[str] = None,
         if status:
             query = query.filter_by(status=status)
 
-        query = query.order_by(AuditLog.timestamp.desc()).limit(limit).offset(offset)
+        if before_timestamp is not None and before_id is not None:
+            query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < (before_timestamp, before_id))
+            offset = 0
 
-        logs = query.all()
-        return [log.to_dict() for log in logs]
+        query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit).offset(offset)
+
+        return [AuditRow(**row._mapping) for row in query]
 
     except Exception as e:
         current_app.logger.error(f"Failed to retrieve audit logs: {e}")
         return []
 
 
+# Count activities by action; the grand total rides along on every row as a
+# window sum over the grouped counts. Built once with bound parameters so
+# every call hits the engine's compiled statement cache.
+_ACTIVITY_SUMMARY_QUERY = select(
+    AuditLog.action,
+    func.count(AuditLog.id).label('count'),
+    func.sum(func.count(AuditLog.id)).over().label('total')
+).where(
+    AuditLog.user_id == bindparam('user_id'),
+    AuditLog.timestamp >= bindparam('cutoff')
+).group_by(AuditLog.action)
+
+
 def get_user_activity_summary(user_id: int, days: int = 30) -> Dict[str, Any]:
     """
     Get activity summary for a user over the specified number of days.
@@ -204,24 +381,19 @@ def get_user_activity_summary(user_id: int, days: int = 30) -> Dict[str, Any]:
     """
     try:
         from datetime import timedelta
-        from sqlalchemy import func
 
         cutoff_date = datetime.utcnow() - timedelta(days=days)
 
-        # Count activities by action
-        activity_counts = db.session.query(
-            AuditLog.action,
-            func.count(AuditLog.id).label('count')
-        ).filter(
-            AuditLog.user_id == user_id,
-            AuditLog.timestamp >= cutoff_date
-        ).group_by(AuditLog.action).all()
+        activity_counts = db.session.execute(
+            _ACTIVITY_SUMMARY_QUERY,
+            {'user_id': user_id, 'cutoff': cutoff_date}
+        ).all()
 
         summary = {
             'user_id': user_id,
             'period_days': days,
-            'total_activities': sum(count for _, count in activity_counts),
-            'activities_by_type': {action: count for action, count in activity_counts}
+            'total_activities': int(activity_counts[0].total) if activity_counts else 0,
+            'activities_by_type': {row.action: row.count for row in activity_counts}
         }
 
         return summary
@@ -235,6 +407,11 @@ def cleanup_old_logs(days_to_keep: int = 365) -> int:
     """
     Clean up audit logs older than specified days.
 
+    Rows are removed oldest-first in batches read straight off the timestamp
+    index, so each batch costs the same however large the table is. The table
+    is not range-partitioned: MySQL partitioned tables cannot carry the
+    users foreign key, and SQLite has no partitioning.
+
     Args:
         days_to_keep: Number of days of logs to keep
 
@@ -246,11 +423,24 @@ def cleanup_old_logs(days_to_keep: int = 365) -> int:
 
         cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
 
-        deleted_count = AuditLog.query.filter(
-            AuditLog.timestamp < cutoff_date
-        ).delete()
-
-        db.session.commit()
+        # Delete in primary-key batches with plain DELETE statements, so the
+        # session is never scanned and each transaction stays small; batches
+        # follow timestamp order so the id lookup is a covering index range
+        deleted_count = 0
+        while True:
+            # The batch is a LIMITed derived table, which MySQL materializes
+            # (so the DELETE may read its own table) and SQLite runs as is
+            batch = select(AuditLog.id).where(AuditLog.timestamp < cutoff_date) \
+                .order_by(AuditLog.timestamp).limit(CLEANUP_BATCH_SIZE).subquery()
+            result = db.session.execute(
+                delete(AuditLog).where(AuditLog.id.in_(select(batch.c.id)))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            deleted_count += result.rowcount
+
+            if result.rowcount < CLEANUP_BATCH_SIZE:
+                break
 
         current_app.logger.info(f"Cleaned up {deleted_count} old audit logs")
         return deleted_count
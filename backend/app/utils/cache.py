@@ -0,0 +1,132 @@
+"""
+Shared Redis cache helpers for Cryptee application.
+Short-lived JSON values visible to every worker; a no-op when Redis is not configured.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+import orjson
+import redis
+from flask import current_app
+from sqlalchemy import DateTime, inspect
+
+logger = logging.getLogger(__name__)
+
+# Cache lookups must never stall a request behind an unhealthy Redis
+REDIS_SOCKET_TIMEOUT = 0.25  # seconds
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Get the application's shared Redis client.
+
+    Returns:
+        Redis client, or None if REDIS_URL is not configured
+    """
+    app = current_app._get_current_object()
+    client = app.extensions.get('cryptee_redis')
+    if client is None and app.config.get('REDIS_URL'):
+        client = redis.from_url(app.config['REDIS_URL'],
+                                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                                socket_connect_timeout=REDIS_SOCKET_TIMEOUT)
+        app.extensions['cryptee_redis'] = client
+    return client
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """
+    Read a cached JSON value.
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Decoded value, or None on a miss or when Redis is unavailable
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        raw = client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return None
+    return orjson.loads(raw) if raw else None
+
+
+def cache_set(key: str, value: Any, ttl: int) -> None:
+    """
+    Store a JSON-serializable value for ttl seconds.
+
+    Args:
+        key: Cache key
+        value: Value to store (datetimes are stored as ISO 8601 strings)
+        ttl: Time to live in seconds
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(key, orjson.dumps(value), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+
+def cache_delete(key: str) -> None:
+    """
+    Invalidate a cached value.
+
+    Args:
+        key: Cache key
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache invalidation failed for {key}: {e}")
+
+
+def row_snapshot(instance, keys) -> dict:
+    """
+    Capture selected column values of a model instance for caching.
+
+    Callers pass an explicit allow-list so secrets (password hashes, key
+    material, storage paths) never reach Redis.
+
+    Args:
+        instance: Loaded SQLAlchemy model instance
+        keys: Column attribute names to capture
+
+    Returns:
+        Dictionary of the selected column values
+    """
+    return {key: getattr(instance, key) for key in keys}
+
+
+def row_restore(model, data: dict):
+    """
+    Rebuild a detached model instance from a cached row_snapshot.
+
+    The instance is not attached to a session, so relationships are not
+    loaded and changes must be written with explicit UPDATE statements.
+    Columns left out of the snapshot are None.
+
+    Args:
+        model: Model class the snapshot was taken from
+        data: Decoded snapshot
+
+    Returns:
+        Model instance carrying the cached column values
+    """
+    mapper = inspect(model)
+    instance = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        value = data.get(attr.key)
+        if value is not None and isinstance(attr.columns[0].type, DateTime):
+            value = datetime.fromisoformat(value)
+        setattr(instance, attr.key, value)
+    return instance
@@ -5,61 +5,25 @@ Handles sending emails for various application events.
 
 import os
 import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
-from flask import current_app, render_template_string
+from flask import current_app
+from jinja2 import Environment
 from threading import Thread
 import logging
 
 logger = logging.getLogger(__name__)
 
-
-class EmailService:
-    """Service for sending email notifications."""
-
-    def __init__(self, app=None):
-        if app:
-            self.smtp_server = app.config.get('SMTP_SERVER', 'smtp.gmail.com')
-            self.smtp_port = app.config.get('SMTP_PORT', 587)
-            self.smtp_username = app.config.get('SMTP_USERNAME')
-            self.smtp_password = app.config.get('SMTP_PASSWORD')
-            self.from_email = app.config.get('FROM_EMAIL', self.smtp_username)
-            self.app_name = app.config.get('APP_NAME', 'Cryptee')
-            self.app_url = app.config.get('APP_URL', 'http://localhost:5000')
-        else:
-            # Lazy initialization for module-level instance
-            self._initialized = False
-            self.smtp_server = 'smtp.gmail.com'
-            self.smtp_port = 587
-            self.smtp_username = None
-            self.smtp_password = None
-            self.from_email = None
-            self.app_name = 'Cryptee'
-            self.app_url = 'http://localhost:5000'
-
-    def _ensure_initialized(self):
-        """Ensure the service is initialized with app context."""
-        if not self._initialized and hasattr(self, '_initialized'):
-            try:
-                self.smtp_server = current_app.config.get('SMTP_SERVER', 'smtp.gmail.com')
-                self.smtp_port = current_app.config.get('SMTP_PORT', 587)
-                self.smtp_username = current_app.config.get('SMTP_USERNAME')
-                self.smtp_password = current_app.config.get('SMTP_PASSWORD')
-                self.from_email = current_app.config.get('FROM_EMAIL', self.smtp_username)
-                self.app_name = current_app.config.get('APP_NAME', 'Cryptee')
-                self.app_url = current_app.config.get('APP_URL', 'http://localhost:5000')
-                self._initialized = True
-            except RuntimeError:
-                # Outside app context, use defaults
-                pass
-
-    def _get_email_template(self, template_name, **kwargs):
-        """Get email template with context variables."""
-        templates = {
-            'share_notification': """
+# HTML email bodies, compiled once at import. Autoescaping keeps user-supplied
+# names and file names from injecting markup into the message.
+_SHARE_NOTIFICATION_SRC = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -110,9 +74,9 @@ class EmailService:
     </div>
 </body>
 </html>
-            """,
+"""
 
-            'welcome_email': """
+_WELCOME_EMAIL_SRC = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -165,9 +129,9 @@ class EmailService:
     </div>
 </body>
 </html>
-            """,
+"""
 
-            'password_reset': """
+_PASSWORD_RESET_SRC = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -214,18 +178,139 @@ class EmailService:
     </div>
 </body>
 </html>
-            """
-        }
+"""
+
+_JINJA_ENV = Environment(autoescape=True)
+
+_COMPILED_TEMPLATES = {
+    'share_notification': _JINJA_ENV.from_string(_SHARE_NOTIFICATION_SRC),
+    'welcome_email': _JINJA_ENV.from_string(_WELCOME_EMAIL_SRC),
+    'password_reset': _JINJA_ENV.from_string(_PASSWORD_RESET_SRC),
+}
 
-        template = templates.get(template_name, '')
-        if not template:
+# Logged-in SMTP connections kept open between sends, keyed by
+# (server, port, username); each entry is (connection, last used)
+_SMTP_POOL = {}
+_SMTP_POOL_LOCK = threading.Lock()
+SMTP_IDLE_TIMEOUT = 100  # Seconds before an idle connection is dropped
+
+
+class EmailService:
+    """Service for sending email notifications."""
+
+    def __init__(self, app=None):
+        # One TLS context shared by every connection: the CA store is loaded
+        # once and certificates are verified (starttls() without a context
+        # skips verification)
+        self._ssl_ctx = ssl.create_default_context()
+        self._ssl_ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+
+        if app:
+            self.smtp_server = app.config.get('SMTP_SERVER', 'smtp.gmail.com')
+            self.smtp_port = app.config.get('SMTP_PORT', 587)
+            self.smtp_username = app.config.get('SMTP_USERNAME')
+            self.smtp_password = app.config.get('SMTP_PASSWORD')
+            self.from_email = app.config.get('FROM_EMAIL', self.smtp_username)
+            self.app_name = app.config.get('APP_NAME', 'Cryptee')
+            self.app_url = app.config.get('APP_URL', 'http://localhost:5000')
+        else:
+            # Lazy initialization for module-level instance
+            self._initialized = False
+            self.smtp_server = 'smtp.gmail.com'
+            self.smtp_port = 587
+            self.smtp_username = None
+            self.smtp_password = None
+            self.from_email = None
+            self.app_name = 'Cryptee'
+            self.app_url = 'http://localhost:5000'
+
+    def _ensure_initialized(self):
+        """Ensure the service is initialized with app context."""
+        if not self._initialized and hasattr(self, '_initialized'):
+            try:
+                self.smtp_server = current_app.config.get('SMTP_SERVER', 'smtp.gmail.com')
+                self.smtp_port = current_app.config.get('SMTP_PORT', 587)
+                self.smtp_username = current_app.config.get('SMTP_USERNAME')
+                self.smtp_password = current_app.config.get('SMTP_PASSWORD')
+                self.from_email = current_app.config.get('FROM_EMAIL', self.smtp_username)
+                self.app_name = current_app.config.get('APP_NAME', 'Cryptee')
+                self.app_url = current_app.config.get('APP_URL', 'http://localhost:5000')
+                self._initialized = True
+            except RuntimeError:
+                # Outside app context, use defaults
+                pass
+
+    def _get_email_template(self, template_name, **kwargs):
+        """Get email template with context variables."""
+        template = _COMPILED_TEMPLATES.get(template_name)
+        if template is None:
             return f"Template '{template_name}' not found"
 
-        # Simple template rendering
-        for key, value in kwargs.items():
-            template = template.replace(f'{{{{ {key} }}}}', str(value))
+        return template.render(**kwargs)
+
+    def _acquire_smtp(self, fresh=False):
+        """Take an idle pooled SMTP connection or open and log in a new one."""
+        key = (self.smtp_server, self.smtp_port, self.smtp_username)
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with _SMTP_POOL_LOCK:
+            idle = [] if fresh else _SMTP_POOL.get(key, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if now - last_used < SMTP_IDLE_TIMEOUT:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+
+        for old in stale:
+            self._close_smtp(old)
+        if conn is not None:
+            return conn
+
+        conn = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            conn.starttls(context=self._ssl_ctx)
+            conn.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            self._close_smtp(conn)
+            raise
+        return conn
+
+    def _release_smtp(self, conn):
+        """Return a healthy SMTP connection to the pool."""
+        key = (self.smtp_server, self.smtp_port, self.smtp_username)
+        with _SMTP_POOL_LOCK:
+            _SMTP_POOL.setdefault(key, []).append((conn, time.monotonic()))
+
+    @staticmethod
+    def _close_smtp(conn):
+        """Close an SMTP connection, ignoring a server that already hung up."""
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    @contextmanager
+    def _smtp_conn(self, fresh=False):
+        """Borrow a pooled SMTP connection; it is dropped if the send fails."""
+        conn = self._acquire_smtp(fresh)
+        try:
+            yield conn
+        except Exception:
+            self._close_smtp(conn)
+            raise
+        self._release_smtp(conn)
 
-        return template
+    def _sendmail(self, to_email, message):
+        """Send a message over a pooled connection, retrying once on a dropped one."""
+        try:
+            with self._smtp_conn() as server:
+                server.sendmail(self.from_email, to_email, message)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError):
+            # A pooled connection may have been closed by the server while idle
+            with self._smtp_conn(fresh=True) as server:
+                server.sendmail(self.from_email, to_email, message)
 
     def _send_email_async(self, to_email, subject, html_content, attachments=None):
         """Send email asynchronously."""
@@ -251,11 +336,7 @@ class EmailService:
                     msg.attach(part)
 
             # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_username, self.smtp_password)
-            server.sendmail(self.from_email, to_email, msg.as_string())
-            server.quit()
+            self._sendmail(to_email, msg.as_string())
 
             logger.info(f"Email sent successfully to {to_email}")
 
@@ -287,11 +368,7 @@ class EmailService:
                     msg.attach(part)
 
             # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_username, self.smtp_password)
-            server.sendmail(self.from_email, to_email, msg.as_string())
-            server.quit()
+            self._sendmail(to_email, msg.as_string())
 
             logger.info(f"Email sent successfully to {to_email}")
             return True
@@ -314,7 +391,7 @@ class EmailService:
             file_size=file_size,
             share_url=share_url,
             expires_at=expires_at,
-            password_required='true' if password_required else 'false',
+            password_required=password_required,
             year=datetime.now().year
         )
 
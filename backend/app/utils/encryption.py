@@ -5,11 +5,9 @@ Uses Web Crypto API compatible encryption for end-to-end security.
 
 import os
 import base64
+import hashlib
 import secrets
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,16 +22,14 @@ class FileEncryption:
         if salt is None:
             salt = secrets.token_bytes(16)  # 128-bit salt
 
-        # Use PBKDF2 with SHA-256
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,  # 256-bit key
-            salt=salt,
-            iterations=100000,  # High iteration count for security
-            backend=default_backend()
+        # Use PBKDF2 with SHA-256, computed entirely inside OpenSSL
+        key = hashlib.pbkdf2_hmac(
+            'sha256',
+            password.encode('utf-8'),
+            salt,
+            100000,  # High iteration count for security
+            dklen=32  # 256-bit key
         )
-
-        key = kdf.derive(password.encode('utf-8'))
         return key, salt
 
     @staticmethod
@@ -47,7 +43,7 @@ class FileEncryption:
             iv = secrets.token_bytes(12)
 
             # Create cipher
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
+            cipher = Cipher(algorithms.AES(key), modes.GCM(iv))
             encryptor = cipher.encryptor()
 
             # Encrypt the data
@@ -82,7 +78,7 @@ class FileEncryption:
             ciphertext = encrypted_data[28:]
 
             # Create cipher
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend())
+            cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag))
             decryptor = cipher.decryptor()
 
             # Decrypt the data
@@ -119,7 +115,7 @@ class FileEncryption:
             iv = secrets.token_bytes(12)
 
             # Create cipher
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
+            cipher = Cipher(algorithms.AES(key), modes.GCM(iv))
             encryptor = cipher.encryptor()
 
             # Encrypt the data
@@ -158,7 +154,7 @@ class FileEncryption:
             ciphertext = encrypted_data[28:]
 
             # Create cipher
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend())
+            cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag))
             decryptor = cipher.decryptor()
 
             # Decrypt the data
@@ -0,0 +1,30 @@
+"""
+JSON provider for Cryptee application.
+Serializes responses with orjson instead of the stdlib json module.
+"""
+
+import orjson
+from flask.json.provider import JSONProvider, _default
+
+# Datetimes are serialized natively as ISO 8601, identical to datetime.isoformat()
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson."""
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as a JSON string."""
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response from orjson's bytes, skipping the str round trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS),
+            mimetype='application/json'
+        )
+
+    def loads(self, s, **kwargs):
+        """Deserialize data from a JSON string or bytes."""
+        return orjson.loads(s)
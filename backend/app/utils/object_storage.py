@@ -0,0 +1,95 @@
+"""
+Object storage utilities for Cryptee application.
+Presigned S3 (or S3-compatible, e.g. MinIO) uploads for message attachments.
+"""
+
+import base64
+import threading
+from typing import Any, Dict, Optional
+import boto3
+from flask import current_app
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def object_storage_enabled() -> bool:
+    """Check whether an attachment bucket is configured."""
+    return bool(current_app.config.get('S3_ATTACHMENT_BUCKET'))
+
+
+def get_s3_client():
+    """
+    Get the shared S3 client, creating it on first use.
+
+    Returns:
+        boto3 S3 client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    's3',
+                    endpoint_url=current_app.config.get('S3_ENDPOINT_URL') or None,
+                    region_name=current_app.config.get('S3_REGION') or None
+                )
+    return _client
+
+
+def presign_attachment_upload(key: str, content_length: int, content_type: str,
+                              checksum: str) -> str:
+    """
+    Create a presigned PUT URL for uploading an attachment directly to the bucket.
+
+    Args:
+        key: Object key to upload to
+        content_length: Exact size in bytes the client will upload
+        content_type: MIME type the client will send
+        checksum: Hex SHA-256 of the content, enforced by S3 on upload
+
+    Returns:
+        Presigned URL
+    """
+    params = {
+        'Bucket': current_app.config['S3_ATTACHMENT_BUCKET'],
+        'Key': key,
+        'ContentLength': content_length,
+        'ContentType': content_type,
+        'ChecksumSHA256': base64.b64encode(bytes.fromhex(checksum)).decode('ascii')
+    }
+
+    return get_s3_client().generate_presigned_url(
+        'put_object',
+        Params=params,
+        ExpiresIn=current_app.config.get('S3_PRESIGN_EXPIRES', 300)
+    )
+
+
+def head_attachment(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up an uploaded attachment object.
+
+    Args:
+        key: Object key
+
+    Returns:
+        Dict with 'size' and 'checksum' (hex SHA-256 or None), or None if missing
+    """
+    client = get_s3_client()
+    try:
+        head = client.head_object(
+            Bucket=current_app.config['S3_ATTACHMENT_BUCKET'],
+            Key=key,
+            ChecksumMode='ENABLED'
+        )
+    except client.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+    checksum = head.get('ChecksumSHA256')
+    return {
+        'size': head['ContentLength'],
+        'checksum': base64.b64decode(checksum).hex() if checksum else None
+    }
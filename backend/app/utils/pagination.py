@@ -0,0 +1,41 @@
+"""
+Keyset pagination helpers for Cryptee application.
+Encodes and decodes opaque (timestamp, id) cursors for list endpoints.
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Encode a keyset pagination cursor.
+
+    Args:
+        timestamp: Sort timestamp of the last row on the page
+        row_id: Primary key of the last row on the page
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a keyset pagination cursor.
+
+    Args:
+        cursor: Cursor string from encode_cursor
+
+    Returns:
+        Tuple of (timestamp, id), or None if the cursor is invalid
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode().split('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
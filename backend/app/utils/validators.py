@@ -7,6 +7,16 @@ import bleach
 from typing import Optional, Tuple
 from werkzeug.utils import secure_filename
 
+# Patterns are compiled once at import; add new ones here rather than inline
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_UPPER_RE = re.compile(r'[A-Z]')
+_LOWER_RE = re.compile(r'[a-z]')
+_DIGIT_RE = re.compile(r'\d')
+_SPECIAL_RE = re.compile(r'[!@#$%^&*(),.?":{}|<>]')
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+_SHARE_LINK_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
 
 def validate_email(email: str) -> Tuple[bool, str]:
     """
@@ -27,9 +37,7 @@ def validate_email(email: str) -> Tuple[bool, str]:
         return False, "Email address is too long"
 
     # Basic email regex pattern
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-
-    if not re.match(pattern, email):
+    if not _EMAIL_RE.match(email):
         return False, "Invalid email format"
 
     return True, ""
@@ -55,10 +63,10 @@ def validate_password(password: str) -> Tuple[bool, str]:
         return False, "Password must be less than 128 characters long"
 
     # Check for required character types
-    has_upper = bool(re.search(r'[A-Z]', password))
-    has_lower = bool(re.search(r'[a-z]', password))
-    has_digit = bool(re.search(r'\d', password))
-    has_special = bool(re.search(r'[!@#$%^&*(),.?":{}|<>]', password))
+    has_upper = bool(_UPPER_RE.search(password))
+    has_lower = bool(_LOWER_RE.search(password))
+    has_digit = bool(_DIGIT_RE.search(password))
+    has_special = bool(_SPECIAL_RE.search(password))
 
     if not (has_upper and has_lower and has_digit):
         return False, "Password must contain uppercase, lowercase, and numeric characters"
@@ -93,7 +101,7 @@ def sanitize_filename(filename: str) -> str:
 
     # Additional sanitization
     # Remove any remaining dangerous characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '', sanitized)
+    sanitized = _UNSAFE_FILENAME_CHARS_RE.sub('', sanitized)
 
     # Ensure filename is not empty after sanitization
     if not sanitized:
@@ -130,7 +138,7 @@ def sanitize_text(text: str, max_length: int = 1000) -> str:
     cleaned = bleach.clean(text, strip=True)
 
     # Additional sanitization - remove control characters
-    cleaned = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', cleaned)
+    cleaned = _CONTROL_CHARS_RE.sub('', cleaned)
 
     return cleaned.strip()
 
@@ -170,7 +178,7 @@ def validate_share_link(share_link: str) -> Tuple[bool, str]:
         return False, "Share link is required"
 
     # Share links should be URL-safe base64 encoded strings
-    if not re.match(r'^[A-Za-z0-9_-]+$', share_link):
+    if not _SHARE_LINK_RE.match(share_link):
         return False, "Invalid share link format"
 
     if len(share_link) < 10 or len(share_link) > 100:
@@ -105,6 +105,74 @@ def migrate_database():
         else:
             print("+ All users already have Cryptee IDs")
 
+        # Canonical participant pair for chat conversations
+        cursor.execute("PRAGMA table_info(chat_conversations)")
+        conversation_columns = [col[1] for col in cursor.fetchall()]
+
+        if conversation_columns and 'participant_low_id' not in conversation_columns:
+            print("Adding participant_low_id/participant_high_id columns...")
+            cursor.execute("ALTER TABLE chat_conversations ADD COLUMN participant_low_id INTEGER")
+            cursor.execute("ALTER TABLE chat_conversations ADD COLUMN participant_high_id INTEGER")
+            cursor.execute("""
+                UPDATE chat_conversations
+                SET participant_low_id = MIN(participant1_id, participant2_id),
+                    participant_high_id = MAX(participant1_id, participant2_id)
+            """)
+            print("+ Added participant pair columns")
+
+        if conversation_columns:
+            try:
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_conversations_participant_pair
+                    ON chat_conversations(participant_low_id, participant_high_id)
+                """)
+                print("+ Created unique index on chat participant pair")
+            except sqlite3.Error as e:
+                print(f"Note: Could not create participant pair index (duplicate conversations?): {e}")
+
+        # Emails are stored lowercased so lookups are a single probe of the email index;
+        # fold legacy mixed-case rows and make uniqueness case-insensitive
+        try:
+            cursor.execute("UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+            if cursor.rowcount:
+                print(f"+ Lowercased {cursor.rowcount} user emails")
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email_ci ON users(email COLLATE NOCASE)")
+            print("+ Created case-insensitive unique index on users.email")
+        except sqlite3.Error as e:
+            print(f"Note: Could not normalize user emails (case-insensitive duplicates?): {e}")
+
+        # Admin user search is a case-insensitive prefix LIKE, which SQLite can
+        # only serve from NOCASE indexes
+        for column in ('first_name', 'last_name'):
+            try:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_users_{column}_ci ON users({column} COLLATE NOCASE)")
+                print(f"+ Created case-insensitive index on users.{column}")
+            except sqlite3.Error as e:
+                print(f"Note: Could not create index on users.{column}: {e}")
+
+        # Composite indexes for hot query patterns
+        composite_indexes = [
+            ('ix_files_user_live_date', 'files', 'user_id, is_deleted, upload_date'),
+            ('ix_files_user_live_name', 'files', 'user_id, is_deleted, original_filename'),
+            ('ix_files_user_live_size', 'files', 'user_id, is_deleted, file_size'),
+            ('ix_shares_recipient_active', 'shares', 'recipient_id, is_active'),
+            ('ix_shares_sharer_created', 'shares', 'sharer_id, created_at'),
+            ('ix_shares_sharer_active_exp', 'shares', 'sharer_id, is_active, expires_at'),
+            ('ix_msg_recipient_list', 'messages', 'recipient_id, is_deleted, created_at, id'),
+            ('ix_msg_sender_list', 'messages', 'sender_id, is_deleted, created_at, id'),
+            ('ix_msg_recipient_unread', 'messages', 'recipient_id, is_read, is_deleted'),
+            ('ix_contact_user_name', 'contacts', 'user_id, name'),
+            ('ix_audit_user_time_action', 'audit_logs', 'user_id, timestamp, action'),
+            ('ix_audit_action_time', 'audit_logs', 'action, timestamp'),
+            ('ix_audit_status_time', 'audit_logs', 'status, timestamp'),
+        ]
+        for index_name, table_name, index_columns in composite_indexes:
+            try:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({index_columns})")
+                print(f"+ Created index {index_name}")
+            except sqlite3.Error as e:
+                print(f"Note: Could not create index {index_name}: {e}")
+
         # Commit changes
         conn.commit()
         print("+ Database migration completed successfully!")
@@ -116,5 +184,29 @@ def migrate_database():
     finally:
         conn.close()
 
+def migrate_mysql_database(database_url):
+    """Add the FULLTEXT index that MySQL message search (MATCH ... AGAINST) needs."""
+    from sqlalchemy import create_engine, inspect, text
+
+    print("Migrating MySQL database")
+    engine = create_engine(database_url)
+    try:
+        with engine.begin() as conn:
+            indexes = {index['name'] for index in inspect(conn).get_indexes('messages')}
+            if 'ix_msg_fulltext' in indexes:
+                print("+ ix_msg_fulltext index already exists")
+            else:
+                conn.execute(text(
+                    "ALTER TABLE messages ADD FULLTEXT INDEX ix_msg_fulltext (subject, content)"
+                ))
+                print("+ Created FULLTEXT index ix_msg_fulltext on messages(subject, content)")
+        print("+ Database migration completed successfully!")
+    finally:
+        engine.dispose()
+
 if __name__ == '__main__':
-    migrate_database()
\ No newline at end of file
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///cryptee_dev.db')
+    if database_url.startswith('mysql'):
+        migrate_mysql_database(database_url)
+    else:
+        migrate_database()
\ No newline at end of file
@@ -157,11 +157,11 @@ const HistoryScreen = () => {
           {item.content}
         </Text>
 
-        {item.attachments && item.attachments.length > 0 && (
+        {item.attachment_count > 0 && (
           <View style={styles.attachments}>
             <Icon name="attach-file" size={16} color="#666" />
             <Text style={styles.attachmentsText}>
-              {item.attachments.length} attachment{item.attachments.length > 1 ? 's' : ''}
+              {item.attachment_count} attachment{item.attachment_count > 1 ? 's' : ''}
             </Text>
           </View>
         )}
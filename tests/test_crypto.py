@@ -0,0 +1,142 @@
+"""
+Tests for file encryption utilities.
+"""
+
+import binascii
+import os
+from pathlib import Path
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from backend.app.utils import crypto
+
+FILE_CIPHERS = [crypto.FILE_CIPHER_AES_GCM, crypto.FILE_CIPHER_CHACHA20_POLY1305]
+
+
+@pytest.fixture
+def plaintext_file(tmp_path):
+    """A file spanning several encryption chunks, with a partial last chunk."""
+    content = os.urandom(crypto.ENCRYPTION_CHUNK_SIZE * 2 + 1234)
+    path = tmp_path / 'plain.bin'
+    path.write_bytes(content)
+    return path, content
+
+
+class TestFileEncryption:
+    """Test streaming file encryption and decryption."""
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_round_trip(self, plaintext_file, algorithm):
+        """Test a file decrypts back to its original contents."""
+        path, content = plaintext_file
+        key = os.urandom(32)
+
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file(str(path), key, algorithm=algorithm)
+        decrypted_path = crypto.decrypt_file(encrypted_path, key, iv_b64, tag_b64,
+                                             str(path) + '.out', algorithm=used)
+
+        assert used == algorithm
+        assert Path(decrypted_path).read_bytes() == content
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_round_trip_empty_file(self, tmp_path, algorithm):
+        """Test an empty file still carries a valid tag."""
+        path = tmp_path / 'empty.bin'
+        path.write_bytes(b'')
+        key = os.urandom(32)
+
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file(str(path), key, algorithm=algorithm)
+        decrypted_path = crypto.decrypt_file(encrypted_path, key, iv_b64, tag_b64,
+                                             str(path) + '.out', algorithm=used)
+
+        assert Path(decrypted_path).read_bytes() == b''
+
+    @pytest.mark.parametrize('algorithm, aead', [
+        (crypto.FILE_CIPHER_AES_GCM, AESGCM),
+        (crypto.FILE_CIPHER_CHACHA20_POLY1305, ChaCha20Poly1305),
+    ])
+    def test_matches_one_shot_aead(self, plaintext_file, algorithm, aead):
+        """Test the streamed output equals the library's one-shot AEAD (ciphertext || tag)."""
+        path, content = plaintext_file
+        key = os.urandom(32)
+
+        encrypted_path, iv_b64, tag_b64, _ = crypto.encrypt_file(str(path), key, algorithm=algorithm)
+        iv = binascii.a2b_base64(iv_b64)
+        tag = binascii.a2b_base64(tag_b64)
+
+        assert Path(encrypted_path).read_bytes() + tag == aead(key).encrypt(iv, content, None)
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_tampered_ciphertext_rejected(self, plaintext_file, algorithm):
+        """Test a modified ciphertext fails authentication and leaves no output."""
+        path, _ = plaintext_file
+        key = os.urandom(32)
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file(str(path), key, algorithm=algorithm)
+
+        with open(encrypted_path, 'r+b') as f:
+            f.seek(crypto.ENCRYPTION_CHUNK_SIZE + 7)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0x01]))
+
+        output_path = str(path) + '.out'
+        with pytest.raises(ValueError):
+            crypto.decrypt_file(encrypted_path, key, iv_b64, tag_b64, output_path, algorithm=used)
+
+        assert not os.path.exists(output_path)
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_tampered_tag_rejected(self, plaintext_file, algorithm):
+        """Test a modified authentication tag is rejected."""
+        path, _ = plaintext_file
+        key = os.urandom(32)
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file(str(path), key, algorithm=algorithm)
+
+        tag = bytearray(binascii.a2b_base64(tag_b64))
+        tag[0] ^= 0x01
+
+        with pytest.raises(ValueError):
+            crypto.decrypt_file(encrypted_path, key, iv_b64, bytes(tag), str(path) + '.out', algorithm=used)
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_wrong_key_rejected(self, plaintext_file, algorithm):
+        """Test decrypting with a different key fails."""
+        path, _ = plaintext_file
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file(str(path), os.urandom(32),
+                                                                    algorithm=algorithm)
+
+        with pytest.raises(ValueError):
+            crypto.decrypt_file(encrypted_path, os.urandom(32), iv_b64, tag_b64,
+                                str(path) + '.out', algorithm=used)
+
+    def test_wrong_algorithm_rejected(self, plaintext_file):
+        """Test decrypting with the other cipher fails instead of returning garbage."""
+        path, _ = plaintext_file
+        key = os.urandom(32)
+        encrypted_path, iv_b64, tag_b64, _ = crypto.encrypt_file(
+            str(path), key, algorithm=crypto.FILE_CIPHER_CHACHA20_POLY1305)
+
+        with pytest.raises(ValueError):
+            crypto.decrypt_file(encrypted_path, key, iv_b64, tag_b64, str(path) + '.out',
+                                algorithm=crypto.FILE_CIPHER_AES_GCM)
+
+    def test_decrypt_requires_algorithm(self, plaintext_file):
+        """Test the cipher must be named when decrypting."""
+        path, _ = plaintext_file
+        key = os.urandom(32)
+        encrypted_path, iv_b64, tag_b64, _ = crypto.encrypt_file(str(path), key)
+
+        with pytest.raises(TypeError):
+            crypto.decrypt_file(encrypted_path, key, iv_b64, tag_b64)
+
+    @pytest.mark.parametrize('algorithm', FILE_CIPHERS)
+    def test_async_round_trip(self, plaintext_file, algorithm):
+        """Test the worker pool variants round-trip a file."""
+        path, content = plaintext_file
+        key = os.urandom(32)
+
+        encrypted_path, iv_b64, tag_b64, used = crypto.encrypt_file_async(
+            str(path), key, algorithm=algorithm).result()
+        decrypted_path = crypto.decrypt_file_async(encrypted_path, key, iv_b64, tag_b64,
+                                                   str(path) + '.out', algorithm=used).result()
+
+        assert Path(decrypted_path).read_bytes() == content
@@ -0,0 +1,115 @@
+"""
+Tests for file management routes.
+"""
+
+import io
+import hashlib
+import pytest
+from flask import Flask
+from backend.app.routes import files
+from backend.app.utils import crypto
+
+
+class TestChecksum:
+    """Test file checksum calculation."""
+
+    def test_files_uses_crypto_checksum(self):
+        """Test files routes use the shared checksum implementation."""
+        assert files.save_with_checksum is crypto.save_with_checksum
+
+    def test_calculate_checksum(self, tmp_path):
+        """Test checksum matches SHA-256 of the file contents."""
+        content = b'cryptee' * 100000
+        path = tmp_path / 'data.bin'
+        path.write_bytes(content)
+
+        assert crypto.calculate_checksum(str(path)) == hashlib.sha256(content).hexdigest()
+
+    def test_calculate_checksum_empty_file(self, tmp_path):
+        """Test checksum of an empty file."""
+        path = tmp_path / 'empty.bin'
+        path.write_bytes(b'')
+
+        assert crypto.calculate_checksum(str(path)) == hashlib.sha256(b'').hexdigest()
+
+    def test_save_with_checksum(self, tmp_path):
+        """Test streaming save writes the file and returns size and checksum."""
+        content = b'cryptee' * 300000
+        path = tmp_path / 'upload.bin'
+
+        size, checksum = crypto.save_with_checksum(io.BytesIO(content), str(path))
+
+        assert size == len(content)
+        assert checksum == hashlib.sha256(content).hexdigest()
+        assert path.read_bytes() == content
+
+    def test_save_with_checksum_size_hint(self, tmp_path):
+        """Test preallocated space is trimmed back to the written size."""
+        content = b'cryptee' * 1000
+        path = tmp_path / 'upload.bin'
+
+        size, checksum = crypto.save_with_checksum(io.BytesIO(content), str(path),
+                                                   size_hint=len(content) * 4, sync=True)
+
+        assert size == len(content)
+        assert path.read_bytes() == content
+
+    def test_save_with_checksum_max_size(self, tmp_path):
+        """Test oversized streams are rejected and the partial file removed."""
+        path = tmp_path / 'big.bin'
+
+        with pytest.raises(ValueError):
+            crypto.save_with_checksum(io.BytesIO(b'x' * 2048), str(path), max_size=1024)
+
+        assert not path.exists()
+
+
+class TestExistingStoredFiles:
+    """Test bulk on-disk existence checks."""
+
+    def test_existing_stored_files(self, tmp_path):
+        """Test only paths present on disk are returned."""
+        present = tmp_path / 'present.bin'
+        present.write_bytes(b'data')
+        missing = tmp_path / 'missing.bin'
+        gone_folder = tmp_path / 'gone' / 'file.bin'
+
+        result = files.existing_stored_files([str(present), str(missing), str(gone_folder)])
+
+        assert result == {str(present)}
+
+
+class TestAllowedFile:
+    """Test upload extension filtering."""
+
+    def test_allowed_file(self, tmp_path):
+        """Test extensions are matched case-insensitively against the cached set."""
+        app = Flask(__name__)
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        app.config['ALLOWED_EXTENSIONS'] = {'txt', 'PDF'}
+
+        with app.app_context():
+            assert files.allowed_file('notes.txt')
+            assert files.allowed_file('Report.PDF')
+            assert files.allowed_file('archive.tar.pdf')
+            assert not files.allowed_file('script.exe')
+            assert not files.allowed_file('txt')
+            assert not files.allowed_file('')
+
+    def test_upload_settings_per_app(self, tmp_path):
+        """Test each app keeps its own settings and later config overrides apply."""
+        first = Flask('first')
+        first.config['UPLOAD_FOLDER'] = str(tmp_path / 'first')
+        first.config['ALLOWED_EXTENSIONS'] = {'txt'}
+        second = Flask('second')
+        second.config['UPLOAD_FOLDER'] = str(tmp_path / 'second')
+        second.config['ALLOWED_EXTENSIONS'] = {'pdf'}
+
+        with first.app_context():
+            assert files.allowed_file('notes.txt')
+            assert files.upload_folder() == str(tmp_path / 'first')
+        with second.app_context():
+            assert not files.allowed_file('notes.txt')
+            second.config['UPLOAD_FOLDER'] = str(tmp_path / 'override')
+            assert files.upload_folder() == str(tmp_path / 'override')
+            assert (tmp_path / 'override').is_dir()